@@ -0,0 +1,293 @@
+import json
+import math
+import os
+import threading
+import time
+
+import calculadora_copsoq_br as motor
+from analise_estatistica import LIMITES_SEMAFORO
+from armazenamento import CABECALHO
+
+# Incrementar sempre que o formato do estado persistido mudar; estados antigos são recalculados.
+VERSAO_ESTADO = 3
+
+# Grupos com menos respostas do que isto não são mostrados, para preservar o anonimato.
+TAMANHO_MINIMO_GRUPO = 5
+
+
+def converter_pontuacao(valor):
+    """Converte um valor lido da planilha ('37,5', '37.5', 37.5 ou '') para float, ou None."""
+    if valor is None:
+        return None
+    if isinstance(valor, str):
+        valor = valor.strip().replace(',', '.')
+        if not valor:
+            return None
+    try:
+        numero = float(valor)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(numero) else numero
+
+
+def faixa_do_semaforo(valor):
+    """Índice da faixa do semáforo (0 verde, 1 amarelo, 2 vermelho) de uma pontuação."""
+    if valor <= LIMITES_SEMAFORO[0]:
+        return 0
+    return 1 if valor <= LIMITES_SEMAFORO[1] else 2
+
+
+def grupos_a_suprimir(contagens, tamanho_minimo=TAMANHO_MINIMO_GRUPO):
+    """
+    Dado {grupo: respostas}, devolve os grupos que não podem ser mostrados: os que têm menos de
+    'tamanho_minimo' respostas e, se juntos somarem menos do que isso (o total publicado
+    permitiria deduzi-los por diferença), também os menores dos restantes até deixarem de somar.
+    """
+    ordenados = sorted(contagens.items(), key=lambda item: item[1])
+    suprimidos = [grupo for grupo, n in ordenados if n < tamanho_minimo]
+    escondidas = sum(contagens[grupo] for grupo in suprimidos)
+    for grupo, n in ordenados[len(suprimidos):]:
+        if escondidas == 0 or escondidas >= tamanho_minimo:
+            break
+        suprimidos.append(grupo)
+        escondidas += n
+    return suprimidos
+
+
+class EstatisticaIncremental:
+    """
+    Contagem, média e variância atualizadas uma observação de cada vez (algoritmo de Welford),
+    mais a contagem de observações em cada faixa do semáforo.
+    """
+
+    __slots__ = ("n", "media", "m2", "faixas")
+
+    def __init__(self, n=0, media=0.0, m2=0.0, faixas=None):
+        self.n = n
+        self.media = media
+        self.m2 = m2
+        self.faixas = list(faixas) if faixas is not None else [0, 0, 0]
+
+    def adicionar(self, valor):
+        self.n += 1
+        delta = valor - self.media
+        self.media += delta / self.n
+        self.m2 += delta * (valor - self.media)
+        self.faixas[faixa_do_semaforo(valor)] += 1
+
+    def combinar(self, outra):
+        """Junta outra estatística a esta (fórmula de Chan) e devolve esta instância."""
+        if outra.n == 0:
+            return self
+        n_total = self.n + outra.n
+        delta = outra.media - self.media
+        self.media += delta * outra.n / n_total
+        self.m2 += outra.m2 + delta * delta * self.n * outra.n / n_total
+        self.n = n_total
+        self.faixas = [a + b for a, b in zip(self.faixas, outra.faixas)]
+        return self
+
+    @property
+    def soma(self):
+        return self.media * self.n
+
+    @property
+    def soma_quadrados(self):
+        return self.m2 + self.n * self.media * self.media
+
+    @property
+    def variancia(self):
+        """Variância amostral; None com menos de duas observações."""
+        return self.m2 / (self.n - 1) if self.n > 1 else None
+
+    @property
+    def desvio_padrao(self):
+        variancia = self.variancia
+        return math.sqrt(variancia) if variancia is not None else None
+
+    def para_dict(self):
+        return {"n": self.n, "media": self.media, "m2": self.m2, "faixas": self.faixas}
+
+    @classmethod
+    def de_dict(cls, dados):
+        return cls(dados["n"], dados["media"], dados["m2"], dados["faixas"])
+
+
+class IndiceSegmentos:
+    """
+    Estatísticas por dimensão para cada combinação de segmentos (Empresa, Setor, Unidade, Onda),
+    mantidas à medida que as respostas chegam. Uma consulta só junta os grupos que
+    correspondem aos filtros, sem voltar a ler as respostas. É partilhado entre sessões:
+    as consultas e as atualizações são serializadas por um lock próprio.
+    """
+
+    def __init__(self, campos=motor.campos_segmento):
+        self.campos = list(campos)
+        self.grupos = {}
+        self.contagens = {}
+        self._lock = threading.Lock()
+
+    def adicionar(self, chave, pontuacoes):
+        """Regista uma resposta do grupo 'chave' (tuplo com um valor por campo; '' = não informado)."""
+        with self._lock:
+            estatisticas = self.grupos.get(chave)
+            if estatisticas is None:
+                estatisticas = self.grupos[chave] = {}
+                self.contagens[chave] = 0
+            self.contagens[chave] += 1
+            for dimensao, valor in pontuacoes.items():
+                estatisticas.setdefault(dimensao, EstatisticaIncremental()).adicionar(valor)
+
+    def valores(self, campo):
+        """Valores distintos já vistos para um campo de segmento (sem o vazio)."""
+        posicao = self.campos.index(campo)
+        with self._lock:
+            return sorted({chave[posicao] for chave in self.grupos if chave[posicao]})
+
+    def consultar(self, filtros, tamanho_minimo=TAMANHO_MINIMO_GRUPO, complementar=True):
+        """
+        Junta os grupos que correspondem a 'filtros' ({campo: valor}) e devolve
+        (total_respostas, {dimensão: EstatisticaIncremental}). As estatísticas vêm vazias se o
+        total for inferior a 'tamanho_minimo' ou se o complemento for: retirando qualquer um dos
+        filtros, as respostas que ficam de fora não podem ser menos do que 'tamanho_minimo',
+        senão a diferença entre as duas vistas exporia esse grupo pequeno. Com
+        'complementar=False' só conta o tamanho do próprio grupo.
+        """
+        condicoes = [(self.campos.index(campo), valor) for campo, valor in filtros.items()]
+        with self._lock:
+            return self._consultar(condicoes, tamanho_minimo, complementar)
+
+    def _consultar(self, condicoes, tamanho_minimo, complementar):
+        total = 0
+        combinadas = {}
+        for chave, estatisticas in self.grupos.items():
+            if all(chave[posicao] == valor for posicao, valor in condicoes):
+                total += self.contagens[chave]
+                for dimensao, estatistica in estatisticas.items():
+                    combinadas.setdefault(dimensao, EstatisticaIncremental()).combinar(estatistica)
+        if total < tamanho_minimo:
+            return total, {}
+        for retirada in range(len(condicoes) if complementar else 0):
+            restantes = condicoes[:retirada] + condicoes[retirada + 1:]
+            complemento = self._contar(restantes) - total
+            if 0 < complemento < tamanho_minimo:
+                return total, {}
+        return total, combinadas
+
+    def _contar(self, condicoes):
+        return sum(
+            n for chave, n in self.contagens.items()
+            if all(chave[posicao] == valor for posicao, valor in condicoes)
+        )
+
+    def para_dict(self):
+        with self._lock:
+            return [
+                {"chave": list(chave), "n": self.contagens[chave], "estatisticas": {d: e.para_dict() for d, e in estatisticas.items()}}
+                for chave, estatisticas in self.grupos.items()
+            ]
+
+    def carregar_dict(self, grupos):
+        with self._lock:
+            for grupo in grupos:
+                chave = tuple(grupo["chave"])
+                self.contagens[chave] = grupo["n"]
+                self.grupos[chave] = {d: EstatisticaIncremental.de_dict(e) for d, e in grupo["estatisticas"].items()}
+
+
+class AgregadorIncremental:
+    """
+    Mantém as médias e variâncias por dimensão sem reler a planilha inteira.
+    Guarda quantas linhas já foram processadas e, a cada atualização, pede apenas
+    as linhas acrescentadas depois disso. O estado é persistido num ficheiro JSON local,
+    com a 'origem' das linhas: um estado de outro armazenamento é ignorado e recalculado.
+    """
+
+    def __init__(self, caminho_estado, cabecalho=CABECALHO, intervalo_minimo=60, origem=None):
+        self.caminho_estado = caminho_estado
+        self.origem = origem
+        self.cabecalho = list(cabecalho)
+        self.intervalo_minimo = intervalo_minimo
+        self._posicoes = {dimensao: self.cabecalho.index(dimensao) for dimensao in motor.definicao_dimensoes if dimensao in self.cabecalho}
+        self._posicoes_segmento = [self.cabecalho.index(campo) if campo in self.cabecalho else None for campo in motor.campos_segmento]
+        self._lock = threading.Lock()
+        self._ultima_consulta = 0.0
+        self.redefinir(apagar_ficheiro=False)
+        self._carregar()
+
+    def redefinir(self, apagar_ficheiro=True):
+        """Descarta o estado acumulado; a próxima atualização relê todas as linhas."""
+        with self._lock:
+            self.linhas_processadas = 0
+            self.estatisticas = {dimensao: EstatisticaIncremental() for dimensao in self._posicoes}
+            self.segmentos = IndiceSegmentos()
+            self._ultima_consulta = 0.0
+            if apagar_ficheiro and os.path.exists(self.caminho_estado):
+                os.remove(self.caminho_estado)
+
+    def atualizar(self, obter_linhas_novas, forcar=False):
+        """
+        Processa as linhas novas devolvidas por 'obter_linhas_novas(inicio)', onde 'inicio'
+        é o número de linhas de dados já processadas. Devolve quantas linhas foram acrescentadas.
+        Não consulta a origem se a última consulta tiver sido há menos de 'intervalo_minimo' segundos.
+        """
+        with self._lock:
+            agora = time.monotonic()
+            if not forcar and self._ultima_consulta and agora - self._ultima_consulta < self.intervalo_minimo:
+                return 0
+            linhas_novas = obter_linhas_novas(self.linhas_processadas)
+            self._ultima_consulta = agora
+            for linha in linhas_novas:
+                self._processar_linha(linha)
+            self.linhas_processadas += len(linhas_novas)
+            if linhas_novas:
+                self._guardar()
+            return len(linhas_novas)
+
+    def _processar_linha(self, linha):
+        pontuacoes = {}
+        for dimensao, posicao in self._posicoes.items():
+            valor = converter_pontuacao(linha[posicao]) if posicao < len(linha) else None
+            if valor is not None:
+                self.estatisticas[dimensao].adicionar(valor)
+                pontuacoes[dimensao] = valor
+        chave = tuple(
+            str(linha[posicao]).strip() if posicao is not None and posicao < len(linha) and linha[posicao] is not None else ""
+            for posicao in self._posicoes_segmento
+        )
+        self.segmentos.adicionar(chave, pontuacoes)
+
+    def medias(self):
+        """Dicionário {dimensão: média}, com None para dimensões ainda sem dados."""
+        return {dimensao: (estatistica.media if estatistica.n else None) for dimensao, estatistica in self.estatisticas.items()}
+
+    def _guardar(self):
+        estado = {
+            "versao": VERSAO_ESTADO,
+            "origem": self.origem,
+            "cabecalho": self.cabecalho,
+            "linhas_processadas": self.linhas_processadas,
+            "estatisticas": {dimensao: estatistica.para_dict() for dimensao, estatistica in self.estatisticas.items()},
+            "segmentos": self.segmentos.para_dict(),
+        }
+        pasta = os.path.dirname(self.caminho_estado)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+        temporario = f"{self.caminho_estado}.tmp"
+        with open(temporario, "w", encoding="utf-8") as ficheiro:
+            json.dump(estado, ficheiro, ensure_ascii=False)
+        os.replace(temporario, self.caminho_estado)
+
+    def _carregar(self):
+        try:
+            with open(self.caminho_estado, encoding="utf-8") as ficheiro:
+                estado = json.load(ficheiro)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return
+        if estado.get("versao") != VERSAO_ESTADO or estado.get("cabecalho") != self.cabecalho or estado.get("origem") != self.origem:
+            return
+        self.linhas_processadas = estado["linhas_processadas"]
+        for dimensao, dados in estado["estatisticas"].items():
+            if dimensao in self.estatisticas:
+                self.estatisticas[dimensao] = EstatisticaIncremental.de_dict(dados)
+        self.segmentos.carregar_dict(estado.get("segmentos", []))
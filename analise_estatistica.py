@@ -0,0 +1,113 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+import calculadora_copsoq_br as motor
+
+# Limites do semáforo usados no painel: até 33,3 verde, até 66,6 amarelo, acima vermelho.
+LIMITES_SEMAFORO = (33.3, 66.6)
+FAIXAS_SEMAFORO = ["Verde", "Amarelo", "Vermelho"]
+
+
+def _intervalos_bootstrap(matriz, validos, n_reamostras, nivel_confianca, rng):
+    """
+    Intervalos de confiança bootstrap (percentil) da média de cada coluna.
+    Como as pontuações assumem poucos valores distintos, reamostrar n respostas com reposição
+    equivale a sortear as contagens de cada valor de uma multinomial: cada coluna custa uma
+    matriz (reamostras x valores distintos), qualquer que seja o número de respondentes.
+    """
+    alfa = (1 - nivel_confianca) / 2
+    inferiores = np.full(matriz.shape[1], np.nan)
+    superiores = np.full(matriz.shape[1], np.nan)
+    for j in range(matriz.shape[1]):
+        valores, contagens = np.unique(matriz[validos[:, j], j], return_counts=True)
+        n = contagens.sum()
+        if n < 2:
+            continue
+        sorteios = rng.multinomial(n, contagens / n, size=n_reamostras)
+        medias = sorteios @ valores / n
+        inferiores[j], superiores[j] = np.quantile(medias, [alfa, 1 - alfa])
+    return inferiores, superiores
+
+
+def resumo_estatistico(pontuacoes, n_reamostras=2000, nivel_confianca=0.95, semente=0):
+    """
+    Resumo por dimensão a partir das pontuações individuais (DataFrame N x dimensões, com NaN
+    para ausentes): n, média, desvio-padrão, quartis, intervalo de confiança bootstrap da média
+    e a proporção de respondentes em cada faixa do semáforo.
+    """
+    if isinstance(pontuacoes, pd.DataFrame):
+        dimensoes = list(pontuacoes.columns)
+        matriz = pontuacoes.apply(pd.to_numeric, errors='coerce').to_numpy(dtype=np.float64)
+    else:
+        dimensoes = list(motor.definicao_dimensoes.keys())
+        matriz = np.asarray(pontuacoes, dtype=np.float64)
+    validos = ~np.isnan(matriz)
+    n = validos.sum(axis=0)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        soma = np.where(validos, matriz, 0.0).sum(axis=0)
+        media = soma / n
+        desvios = np.where(validos, matriz - media, 0.0)
+        desvio_padrao = np.sqrt((desvios ** 2).sum(axis=0) / (n - 1))
+        desvio_padrao[n < 2] = np.nan
+        faixa_verde = (validos & (matriz <= LIMITES_SEMAFORO[0])).sum(axis=0) / n
+        faixa_amarela = (validos & (matriz > LIMITES_SEMAFORO[0]) & (matriz <= LIMITES_SEMAFORO[1])).sum(axis=0) / n
+        faixa_vermelha = (validos & (matriz > LIMITES_SEMAFORO[1])).sum(axis=0) / n
+
+    quartis = np.full((3, matriz.shape[1]), np.nan)
+    com_dados = n > 0
+    if com_dados.any():
+        quartis[:, com_dados] = np.nanpercentile(matriz[:, com_dados], [25, 50, 75], axis=0)
+
+    rng = np.random.default_rng(semente)
+    ic_inferior, ic_superior = _intervalos_bootstrap(matriz, validos, n_reamostras, nivel_confianca, rng)
+
+    return pd.DataFrame({
+        'n': n,
+        'Média': media,
+        'Desvio-padrão': desvio_padrao,
+        'Q1 (25%)': quartis[0],
+        'Mediana': quartis[1],
+        'Q3 (75%)': quartis[2],
+        'IC inferior': ic_inferior,
+        'IC superior': ic_superior,
+        f'% {FAIXAS_SEMAFORO[0]}': faixa_verde * 100,
+        f'% {FAIXAS_SEMAFORO[1]}': faixa_amarela * 100,
+        f'% {FAIXAS_SEMAFORO[2]}': faixa_vermelha * 100,
+    }, index=pd.Index(dimensoes, name='Dimensão'))
+
+
+class CacheDeResumos:
+    """Guarda os últimos resumos calculados, indexados pela versão do conjunto de dados."""
+
+    def __init__(self, maximo=16):
+        self.maximo = maximo
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obter(self, versao, obter_pontuacoes, **opcoes):
+        """
+        Devolve o resumo da 'versao' indicada, calculando-o apenas se ainda não estiver em cache.
+        'obter_pontuacoes' só é chamado quando é preciso calcular.
+        """
+        chave = (versao, tuple(sorted(opcoes.items())))
+        with self._lock:
+            if chave in self._itens:
+                self._itens.move_to_end(chave)
+                return self._itens[chave]
+        resumo = resumo_estatistico(obter_pontuacoes(), **opcoes)
+        with self._lock:
+            self._itens[chave] = resumo
+            while len(self._itens) > self.maximo:
+                self._itens.popitem(last=False)
+        return resumo
+
+    def limpar(self):
+        with self._lock:
+            self._itens.clear()
+
+
+cache_de_resumos = CacheDeResumos()
@@ -1,52 +1,72 @@
 import streamlit as st
 import gspread
 import pandas as pd
-import plotly.express as px
 from datetime import datetime
 import calculadora_copsoq_br as motor
-from fpdf import FPDF
-import io
-import requests
-from PIL import Image
+import esquema_copsoq as esquema
+from analise_estatistica import LIMITES_SEMAFORO, cache_de_resumos
+from agregados_incrementais import AgregadorIncremental, TAMANHO_MINIMO_GRUPO, grupos_a_suprimir
+from armazenamento import ArmazenamentoGoogleSheets, ArmazenamentoSQLite, montar_linha
+from carregador_multiplas_planilhas import CarregadorMultiplasPlanilhas
+from exportacao import FORMATOS, obter_exportacao, limpar_cache as limpar_cache_exportacoes
+from fila_de_gravacao import obter_gravador
+import instrumentacao
+from instrumentacao import anotar, cronometrado, medir
+from ondas import RepositorioOndas, comparar_ondas, criar_instantaneo, diferencas_consecutivas, evolucao_das_medias
+import os
+from relatorio_pdf import ErroLogo, criar_grafico_medias, limpar_caches, obter_logo, obter_relatorio_pdf, tabela_de_medias
 
 # --- CONFIGURAÇÃO INICIAL ---
 st.set_page_config(page_title="IPSI | Diagnóstico COPSOQ II", layout="wide")
 
 # --- FUNÇÕES GLOBAIS E DE BANCO DE DADOS (Sem alterações) ---
 NOME_DA_PLANILHA = 'Resultados_COPSOQ_II_BR_Validado'
+CAMINHO_ESTADO_AGREGADOS = os.path.join('.estado_copsoq', 'agregados.json')
+CAMINHO_SQLITE_PADRAO = os.path.join('.estado_copsoq', 'respostas.sqlite3')
+CAMINHO_SPOOL = os.path.join('.estado_copsoq', 'respostas_pendentes.jsonl')
+CAMINHO_ONDAS = os.path.join('.estado_copsoq', 'ondas')
 
+# As funções em cache são medidas por fora: a medição fica 'hit' salvo quando o corpo corre e a marca 'miss'.
+@cronometrado("conectar_gsheet", cache="hit")
 @st.cache_resource(ttl=600)
 def conectar_gsheet():
     """Conecta-se à Planilha Google usando as credenciais do Streamlit Secrets."""
+    anotar(cache="miss")
     creds = dict(st.secrets["gcp_service_account"])
     creds["private_key"] = creds["private_key"].replace("\\n", "\n")
     gc = gspread.service_account_from_dict(creds)
     return gc
 
+@st.cache_resource
+def obter_armazenamento():
+    """
+    Escolhe onde as respostas são gravadas, conforme a secção [armazenamento] dos 'Secrets':
+    tipo = "sqlite" (com 'caminho') usa uma base local; por omissão usa o Google Sheets.
+    """
+    try:
+        config = dict(st.secrets.get("armazenamento", {}))
+    except FileNotFoundError:
+        config = {}
+    if config.get("tipo") == "sqlite":
+        return ArmazenamentoSQLite(config.get("caminho", CAMINHO_SQLITE_PADRAO))
+    return ArmazenamentoGoogleSheets(conectar_gsheet(), NOME_DA_PLANILHA)
+
+class ErroCarregamento(Exception):
+    """As respostas individuais não puderam ser lidas (ou vieram incompletas)."""
+
+
+@cronometrado("carregar_dados_completos", cache="hit")
 @st.cache_data(ttl=60)
-def carregar_dados_completos(_gc):
+def carregar_dados_completos(_armazenamento, linhas=None):
     """
     Carrega todos os dados da planilha de forma robusta, com tratamento de erros aprimorado.
+    Com 'linhas', devolve só as primeiras 'linhas' respostas; como o número faz parte da chave
+    da cache, os dados correspondem sempre a essa versão.
     """
+    anotar(cache="miss")
     try:
-        spreadsheet = _gc.open(NOME_DA_PLANILHA)
-        worksheet = spreadsheet.sheet1
-        todos_os_valores = worksheet.get_all_values()
-        
-        if len(todos_os_valores) < 2:
-            return pd.DataFrame()
-
-        dados = todos_os_valores[1:]
-        cabecalhos_respostas = [f"Q{i+1}" for i in range(32)]
-        cabecalhos_dimensoes = list(motor.definicao_dimensoes.keys())
-        cabecalho_correto = ["Timestamp"] + cabecalhos_respostas + cabecalhos_dimensoes
-        
-        num_cols_data = len(dados[0]) if dados else 0
-        cabecalho_para_usar = cabecalho_correto[:num_cols_data]
-        
-        df = pd.DataFrame(dados, columns=cabecalho_para_usar)
-        return df
-        
+        df = _armazenamento.carregar()
+        return df.iloc[:linhas] if linhas is not None else df
     except gspread.exceptions.SpreadsheetNotFound:
         st.error(f"Erro Crítico: A planilha '{NOME_DA_PLANILHA}' não foi encontrada. Verifique o nome.")
         return pd.DataFrame()
@@ -61,143 +81,152 @@ def carregar_dados_completos(_gc):
         st.error(f"Ocorreu um erro inesperado ao carregar os dados: {e}")
         return pd.DataFrame()
 
-# --- LÓGICA DE GERAÇÃO DE PDF (Sem alterações) ---
+def carregar_versao(armazenamento, linhas):
+    """Respostas correspondentes às 'linhas' já processadas pelo agregador; levanta ErroCarregamento se a leitura falhar."""
+    df = carregar_dados_completos(armazenamento, linhas)
+    if len(df) < linhas:
+        raise ErroCarregamento("Não foi possível ler as respostas individuais. Tente novamente daqui a pouco.")
+    return df
 
-def baixar_logo_em_memoria(url):
+@st.cache_resource
+def obter_agregador(origem):
+    """
+    Agregador partilhado entre sessões; o estado sobrevive a reinícios através do ficheiro local.
+    'origem' identifica o armazenamento, para não reaproveitar o estado de outro.
+    """
+    return AgregadorIncremental(CAMINHO_ESTADO_AGREGADOS, intervalo_minimo=60, origem=origem)
+
+@st.cache_resource
+def obter_carregador_clientes():
+    """
+    Carregador das planilhas de vários clientes, configuradas na secção [clientes] dos 'Secrets'
+    (cliente = "nome da planilha"). Devolve None se não houver clientes configurados.
+    """
     try:
-        if not url.strip(): return None, None
-        headers = {'User-Agent': 'Mozilla/5.0'}
-        response = requests.get(url, headers=headers, stream=True, timeout=10)
-        response.raise_for_status()
-        img_buffer = io.BytesIO(response.content)
-        img = Image.open(img_buffer)
-        img_format = img.format.upper()
-        if img_format not in ['JPEG', 'PNG', 'GIF']:
-            st.warning(f"Formato de imagem '{img_format}' não suportado. Use JPG, PNG ou GIF.")
-            return None, None
-        img_buffer.seek(0)
-        return img_buffer, img_format
-    except Exception:
-        st.warning(f"Falha ao baixar ou processar o logo. O PDF será gerado sem ele.")
-        return None, None
-
-class PDF(FPDF):
-    def __init__(self, logo_buffer=None, logo_format=None):
-        super().__init__()
-        self.logo_buffer = logo_buffer
-        self.logo_format = logo_format
-
-    def header_fallback_texto(self):
-        self.set_font('Arial', 'B', 16)
-        self.set_text_color(0, 51, 102)
-        self.cell(0, 10, 'IPSI', 0, 0, 'L')
-        self.ln(5)
-        self.set_font('Arial', 'I', 10)
-        self.set_text_color(102, 102, 102)
-        self.cell(0, 10, 'Consultoria em Saúde Organizacional', 0, 1, 'L')
-
-    def header(self):
-        logo_adicionado = False
-        if self.logo_buffer and self.logo_format:
-            try:
-                self.image(self.logo_buffer, x=10, y=8, h=12, type=self.logo_format)
-                logo_adicionado = True
-            except Exception:
-                pass
-        if not logo_adicionado:
-            self.header_fallback_texto()
-        self.set_line_width(0.5)
-        self.set_draw_color(0, 51, 102)
-        self.line(10, 25, 200, 25)
-        self.ln(10)
-        self.set_font('Arial', 'B', 12)
-        self.set_text_color(0, 0, 0)
-        self.cell(0, 10, 'Relatório de Diagnóstico Psicossocial - COPSOQ II (Versão Curta - Brasil)', 0, 1, 'C')
-        self.ln(5)
-
-    def footer(self):
-        self.set_y(-15)
-        self.set_font('Arial', 'I', 8)
-        self.cell(0, 10, f'Página {self.page_no()}', 0, 0, 'C')
-
-def gerar_relatorio_pdf(df_medias, total_respostas, logo_url=None):
-    logo_buffer, logo_format = None, None
-    if logo_url:
-        logo_buffer, logo_format = baixar_logo_em_memoria(logo_url)
-    pdf = PDF(logo_buffer=logo_buffer, logo_format=logo_format)
-    pdf.add_page()
-    pdf.set_font('Arial', 'B', 14)
-    pdf.cell(0, 10, 'Sumário dos Resultados', 0, 1, 'L')
-    pdf.set_font('Arial', '', 12)
-    pdf.multi_cell(0, 10, f"Este relatório apresenta a média consolidada dos resultados do questionário, com base num total de {total_respostas} respostas recolhidas.")
-    pdf.ln(10)
-    pdf.set_font('Arial', 'B', 12)
-    pdf.cell(0, 10, 'Tabela de Pontuações Médias por Dimensão', 0, 1, 'L')
-    pdf.set_font('Arial', 'B', 10)
-    col_width_dimensao = 130
-    col_width_pontuacao = 40
-    pdf.cell(col_width_dimensao, 10, 'Dimensão', 1, 0, 'C')
-    pdf.cell(col_width_pontuacao, 10, 'Pontuação Média', 1, 1, 'C')
-    pdf.set_font('Arial', '', 10)
-    for index, row in df_medias.iterrows():
-        pdf.cell(col_width_dimensao, 8, row['Dimensão'].encode('latin-1', 'replace').decode('latin-1'), 1, 0)
-        pdf.cell(col_width_pontuacao, 8, f"{row['Pontuação Média']:.2f}", 1, 1, 'C')
-    pdf.ln(10)
-    buffer = io.BytesIO()
-    pdf.output(buffer)
-    return buffer.getvalue()
-
-# --- PÁGINA 1: QUESTIONÁRIO PÚBLICO (Sem alterações) ---
+        clientes = dict(st.secrets.get("clientes", {}))
+    except FileNotFoundError:
+        clientes = {}
+    if not clientes:
+        return None
+    return CarregadorMultiplasPlanilhas(conectar_gsheet(), clientes)
+
+@st.cache_resource
+def obter_repositorio_ondas():
+    """Instantâneos das ondas já fechadas, partilhados entre sessões."""
+    return RepositorioOndas(CAMINHO_ONDAS)
+
+def atualizar_agregados(armazenamento):
+    """Atualiza o agregador com as linhas novas e devolve-o (ou None em caso de erro)."""
+    agregador = obter_agregador(armazenamento.origem)
+    try:
+        with medir("atualizar_agregados") as medicao:
+            medicao.anotar(linhas_novas=agregador.atualizar(armazenamento.ler_linhas))
+    except gspread.exceptions.SpreadsheetNotFound:
+        st.error(f"Erro Crítico: A planilha '{NOME_DA_PLANILHA}' não foi encontrada. Verifique o nome.")
+        return None
+    except gspread.exceptions.APIError:
+        st.error("Erro de Permissão ao aceder ao Google Sheets. Tente clicar no botão 'Limpar Cache e Recarregar Dados'.")
+        return None
+    except Exception as e:
+        st.error(f"Ocorreu um erro inesperado ao carregar os dados: {e}")
+        return None
+    return agregador
+
+def mostrar_diagnostico():
+    """Painel escondido (?page=admin&diagnostico=1) com os tempos das etapas medidas neste processo."""
+    with st.expander("🩺 Diagnóstico de desempenho", expanded=True):
+        if not instrumentacao.ativa():
+            st.caption("A instrumentação está desligada (defina COPSOQ_INSTRUMENTACAO=1 ou ligue-a aqui).")
+            if st.button("Ligar medições"):
+                instrumentacao.ativar()
+                st.rerun()
+            return
+        st.caption(f"Últimas {len(instrumentacao.medicoes())} medições, desde o arranque ou a última limpeza. Os tempos desta execução aparecem na próxima.")
+        st.dataframe(instrumentacao.resumo().style.format("{:.1f}", subset=["p50 (ms)", "p95 (ms)", "máx (ms)"]), use_container_width=True)
+        col1, col2, col3 = st.columns(3)
+        col1.download_button("💾 Medições (.jsonl)", data=instrumentacao.para_jsonl(), file_name="medicoes_copsoq.jsonl", mime="application/x-ndjson")
+        if col2.button("Limpar medições"):
+            instrumentacao.limpar()
+            st.rerun()
+        if col3.button("Desligar medições"):
+            instrumentacao.desativar()
+            st.rerun()
+
+# --- LÓGICA DE GERAÇÃO DE PDF ---
+# A geração do PDF e o download do logo vivem em 'relatorio_pdf', com caches próprias.
+
+def ler_segmentos_da_url():
+    """
+    Lê os segmentos do respondente a partir do link enviado pelo consultor,
+    ex.: ?empresa=ACME&unidade=SP&onda=2025-1 (parâmetros em minúsculas).
+    """
+    params = st.query_params
+    return {campo: params.get(campo.lower()) for campo in motor.campos_segmento if params.get(campo.lower())}
+
+@st.fragment
+def renderizar_tema(nome_tema, dimensoes):
+    """
+    Desenha as perguntas de um tema como fragmento: responder a uma pergunta só volta a
+    executar este tema. A página inteira só é atualizada quando o tema fica completo
+    (ou deixa de estar), para refletir o progresso global e mostrar o botão de envio.
+    """
+    for titulo_dimensao, perguntas in dimensoes:
+        st.subheader(titulo_dimensao)
+        for q_key, q_text in perguntas:
+            st.radio(label=q_text, options=esquema.ESCALA_FREQUENCIA, key=q_key, horizontal=True)
+        st.markdown("---")
+    chaves_do_tema = esquema.PERGUNTAS_POR_TEMA[nome_tema]
+    respondidas = sum(st.session_state[key] is not None for key in chaves_do_tema)
+    st.caption(f"{respondidas} de {len(chaves_do_tema)} perguntas respondidas neste tema.")
+    chave_estado = f"_tema_completo_{nome_tema}"
+    completo = respondidas == len(chaves_do_tema)
+    estado_anterior = st.session_state.get(chave_estado)
+    st.session_state[chave_estado] = completo
+    if estado_anterior is not None and estado_anterior != completo:
+        st.rerun()
+
+# --- PÁGINA 1: QUESTIONÁRIO PÚBLICO ---
 def pagina_do_questionario():
     # ... (código inalterado)
     def salvar_dados(dados_para_salvar):
         try:
-            gc = conectar_gsheet()
-            spreadsheet = gc.open(NOME_DA_PLANILHA)
-            worksheet = spreadsheet.sheet1
-            if not worksheet.get_all_values():
-                cabecalho = ["Timestamp"] + list(dados_para_salvar.keys())
-                worksheet.update('A1', [cabecalho])
-            nova_linha = [datetime.now().strftime("%Y-%m-%d %H:%M:%S")] + [str(v) if v is not None else "" for v in dados_para_salvar.values()]
-            response = worksheet.append_row(nova_linha)
-            if isinstance(response, dict) and "updates" in response: return True
-            else: raise TypeError(f"A resposta da API do Google não foi a esperada. Resposta recebida: {response}")
+            gravador = obter_gravador(CAMINHO_SPOOL, obter_armazenamento)
+            return gravador.enviar(montar_linha(dados_para_salvar))
         except Exception as e:
-            st.error(f"Ocorreu um erro inesperado ao salvar na planilha: {e}")
+            st.error(f"Ocorreu um erro inesperado ao guardar as respostas: {e}")
             return False
-    escala = {1: "Nunca", 2: "Raramente", 3: "Às vezes", 4: "Frequentemente", 5: "Sempre"}
-    opcoes_escala = list(escala.values())
-    dimensoes_agrupadas = {"🧠 Exigências no Trabalho": {"Ritmo de Trabalho": {"Q1": "Você tem que trabalhar muito rápido?", "Q2": "O seu trabalho exige que você trabalhe em um ritmo acelerado?"}, "Exigências Cognitivas": {"Q3": "O seu trabalho exige que você memorize muitas coisas?", "Q4": "O seu trabalho exige que você tome decisões difíceis?"}, "Exigências Emocionais": {"Q5": "O seu trabalho te coloca em situações emocionalmente difíceis?", "Q6": "Você precisa lidar com os problemas pessoais de outras pessoas no seu trabalho?"}},"🛠️ Organização e Conteúdo do Trabalho": {"Influência": {"Q7": "Você tem influência sobre as coisas que afetam o seu trabalho?", "Q8": "Você tem influência sobre o seu ritmo de trabalho?"}, "Possibilidades de Desenvolvimento": {"Q9": "O seu trabalho te dá a possibilidade de aprender coisas novas?", "Q10": "O seu trabalho te dá a oportunidade de desenvolver as suas competências?"}, "Sentido do Trabalho": {"Q11": "O seu trabalho é significativo para você?", "Q12": "Você sente que o trabalho que você faz é importante?"}, "Comprometimento com o Local de Trabalho": {"Q13": "Você gosta de falar sobre o seu trabalho com outras pessoas?", "Q14": "Você se sente orgulhoso(a) de trabalhar nesta organização?"}},"👥 Relações Sociais e Liderança": {"Previsibilidade": {"Q15": "Você recebe com antecedência as informações sobre decisões importantes?", "Q16": "Você recebe todas as informações necessárias para fazer bem o seu trabalho?"}, "Clareza de Papel": {"Q17": "Você sabe exatamente o que se espera de você no trabalho?"}, "Conflito de Papel": {"Q18": "Você recebe tarefas com exigências contraditórias?"}, "Qualidade da Liderança": {"Q19": "O seu chefe imediato é bom em planejar o trabalho?", "Q20": "O seu chefe imediato é bom em resolver conflitos?"}, "Apoio Social do Superior": {"Q21": "Você consegue ajuda e apoio do seu chefe imediato, se necessário?"}, "Apoio Social dos Colegas": {"Q22": "Você consegue ajuda e apoio dos seus colegas, se necessário?"}, "Sentido de Comunidade": {"Q23": "Existe um bom ambiente de trabalho entre você e seus colegas?"}},"🏢 Interface Trabalho-Indivíduo e Saúde": {"Insegurança no Emprego": {"Q24": "Você está preocupado(a) em perder o seu emprego?"}, "Conflito Trabalho-Família": {"Q25": "As exigências do seu trabalho interferem na sua vida familiar e doméstica?"}, "Satisfação no Trabalho": {"Q26": "De um modo geral, o quão satisfeito(a) você está com o seu trabalho?"}, "Saúde em Geral": {"Q27": "Em geral, como você diria que é a sua saúde?"}, "Burnout": {"Q28": "Com que frequência você se sente física e emocionalmente esgotado(a)?"}, "Estresse": {"Q29": "Com que frequência você se sente tenso(a) ou estressado(a)?"}, "Problemas de Sono": {"Q30": "Com que frequência você dorme mal e acorda cansado(a)?"}, "Sintomas Depressivos": {"Q31": "Com que frequência você se sente triste ou deprimido(a)?"}},"🚫 Comportamentos Ofensivos": {"Assédio Moral": {"Q32": "Você já foi submetido(a) a assédio moral (bullying) no seu trabalho nos últimos 12 meses?"}}}
-    todas_as_chaves = [q_key for theme in dimensoes_agrupadas.values() for dimension in theme.values() for q_key in dimension.keys()]
+    todas_as_chaves = esquema.CHAVES_PERGUNTAS
     total_perguntas = len(todas_as_chaves)
     for key in todas_as_chaves:
         if key not in st.session_state: st.session_state[key] = None
     st.title("🧠 COPSOQ II – Versão Curta (Validada para o Brasil)")
     with st.expander("Clique aqui para ver as instruções completas", expanded=True):
         st.markdown("""**Prezado(a) Colaborador(a),**...""")
+    segmentos = ler_segmentos_da_url()
+    # Com ?setores=A,B,C o respondente escolhe o seu setor numa lista fechada (opcional).
+    setores_disponiveis = [setor.strip() for setor in st.query_params.get("setores", "").split(",") if setor.strip()]
+    if setores_disponiveis and "Setor" not in segmentos:
+        setor_escolhido = st.selectbox("Setor (opcional):", ["Prefiro não informar"] + setores_disponiveis, key="setor_respondente")
+        if setor_escolhido in setores_disponiveis:
+            segmentos["Setor"] = setor_escolhido
     st.divider()
     perguntas_respondidas = len([key for key in todas_as_chaves if st.session_state[key] is not None])
     progresso = perguntas_respondidas / total_perguntas if total_perguntas > 0 else 0
     st.progress(progresso, text=f"Progresso: {perguntas_respondidas} de {total_perguntas} perguntas respondidas ({progresso:.0%})")
     st.markdown("---")
-    lista_de_abas = list(dimensoes_agrupadas.keys())
-    tabs = st.tabs(lista_de_abas)
-    for i, (nome_tema, dimensoes) in enumerate(dimensoes_agrupadas.items()):
+    tabs = st.tabs(list(esquema.NOMES_TEMAS))
+    for i, (nome_tema, dimensoes) in enumerate(esquema.TEMAS):
         with tabs[i]:
-            for titulo_dimensao, perguntas in dimensoes.items():
-                st.subheader(titulo_dimensao)
-                for q_key, q_text in perguntas.items():
-                    st.radio(label=q_text, options=opcoes_escala, key=q_key, horizontal=True)
-                st.markdown("---")
+            renderizar_tema(nome_tema, dimensoes)
     if progresso == 1.0:
         st.success("🎉 **Excelente! Você respondeu a todas as perguntas.**")
         if st.button("Enviar Respostas", type="primary", use_container_width=True):
             with st.spinner('Calculando e enviando...'):
                 respostas_para_salvar = {key: st.session_state[key] for key in todas_as_chaves}
-                resultados_dimensoes = motor.calcular_dimensoes(respostas_para_salvar)
-                dados_completos = {**respostas_para_salvar, **resultados_dimensoes}
+                dados_completos = motor.calcular_registro(respostas_para_salvar, segmentos)
                 if salvar_dados(dados_completos):
                     for key in todas_as_chaves: del st.session_state[key]
+                    for nome_tema in esquema.NOMES_TEMAS: st.session_state.pop(f"_tema_completo_{nome_tema}", None)
                     st.balloons()
                     st.success("✅ Respostas enviadas com sucesso. Muito obrigado!")
                     st.rerun()
@@ -244,67 +273,169 @@ def pagina_do_administrador():
             st.rerun() # Recarrega a página para mostrar a tela de login
 
     st.success("Acesso garantido!")
+    if st.query_params.get("diagnostico") == "1":
+        mostrar_diagnostico()
     st.divider()
     
     st.warning("Se encontrar um erro ou os dados parecerem desatualizados, clique no botão abaixo.")
     if st.button("🔄 Limpar Cache e Recarregar Dados"):
+        obter_agregador(obter_armazenamento().origem).redefinir()
+        limpar_caches()
+        cache_de_resumos.limpar()
+        limpar_cache_exportacoes()
         st.cache_data.clear()
         st.cache_resource.clear()
         st.success("Cache limpo! A recarregar a página...")
         st.rerun()
 
-    gc = conectar_gsheet()
-    df = carregar_dados_completos(gc)
+    armazenamento = obter_armazenamento()
+    agregador = atualizar_agregados(armazenamento)
 
-    if df.empty:
+    if agregador is None or agregador.linhas_processadas == 0:
         st.info("Ainda não há dados para analisar ou ocorreu uma falha na conexão. Tente limpar o cache acima.")
         return
 
-    total_respostas = len(df)
+    total_respostas = agregador.linhas_processadas
     st.metric("Total de Respostas Recebidas", f"{total_respostas}")
     st.divider()
 
     st.header("📊 Análise Geral dos Resultados")
-    
-    nomes_dimensoes = list(motor.definicao_dimensoes.keys())
-    df_analise = df.copy()
-    
-    for dimensao in nomes_dimensoes:
-        if dimensao in df_analise.columns:
-            if df_analise[dimensao].dtype == 'object':
-                df_analise[dimensao] = df_analise[dimensao].str.replace(',', '.', regex=False)
-            df_analise[dimensao] = pd.to_numeric(df_analise[dimensao], errors='coerce')
-            
-    dimensoes_presentes = [dim for dim in nomes_dimensoes if dim in df_analise.columns and pd.api.types.is_numeric_dtype(df_analise[dim])]
-    
-    if not dimensoes_presentes:
+
+    # Filtros por segmento, respondidos pelo índice de grupos sem reler as respostas.
+    filtros = {}
+    campos_com_valores = [(campo, agregador.segmentos.valores(campo)) for campo in motor.campos_segmento]
+    campos_com_valores = [(campo, valores) for campo, valores in campos_com_valores if valores]
+    if campos_com_valores:
+        colunas_filtro = st.columns(len(campos_com_valores))
+        for coluna, (campo, valores) in zip(colunas_filtro, campos_com_valores):
+            escolha = coluna.selectbox(campo, ["Todos"] + valores, key=f"filtro_{campo}")
+            if escolha != "Todos":
+                filtros[campo] = escolha
+
+    if filtros:
+        total_respostas, estatisticas = agregador.segmentos.consultar(filtros, TAMANHO_MINIMO_GRUPO)
+        if not estatisticas:
+            st.warning(f"Os resultados deste grupo não são mostrados para preservar o anonimato: o grupo, ou as respostas que ficam fora dele, têm menos de {TAMANHO_MINIMO_GRUPO} respostas.")
+            return
+        st.caption(f"Respostas no grupo selecionado: {total_respostas}")
+        medias = pd.Series({dimensao: estatistica.media for dimensao, estatistica in estatisticas.items() if estatistica.n}, dtype='float64')
+    else:
+        medias = pd.Series(agregador.medias(), dtype='float64').dropna()
+
+    if medias.empty:
         st.error("Erro de Análise: Nenhuma coluna de dimensão com dados numéricos válidos foi encontrada.")
         return
-        
-    medias = df_analise[dimensoes_presentes].mean().sort_values(ascending=True)
-    df_medias = medias.reset_index()
-    df_medias.columns = ['Dimensão', 'Pontuação Média']
+
+    df_medias = tabela_de_medias(medias)
     
     def estilo_semaforo(row):
         valor = row['Pontuação Média']
-        if valor <= 33.3: return ['background-color: #d4edda; color: #155724'] * 2
-        elif valor <= 66.6: return ['background-color: #fff3cd; color: #856404'] * 2
+        if valor <= LIMITES_SEMAFORO[0]: return ['background-color: #d4edda; color: #155724'] * 2
+        elif valor <= LIMITES_SEMAFORO[1]: return ['background-color: #fff3cd; color: #856404'] * 2
         else: return ['background-color: #f8d7da; color: #721c24'] * 2
 
-    tab1, tab2 = st.tabs(["Visão Gráfica", "Tabela Detalhada"])
+    tab1, tab2, tab3, tab4 = st.tabs(["Visão Gráfica", "Tabela Detalhada", "Distribuição e Intervalos", "Comparação entre Ondas"])
 
     with tab1:
         st.subheader("Pontuação Média por Dimensão (0-100)")
         if not df_medias.empty:
-            fig = px.bar(df_medias, x='Pontuação Média', y='Dimensão', orientation='h', title='Pontuação Média por Dimensão', text=df_medias['Pontuação Média'].apply(lambda x: f'{x:.2f}'), color='Pontuação Média', color_continuous_scale='RdYlGn_r', height=800)
-            fig.update_layout(yaxis={'categoryorder':'total ascending'})
-            st.plotly_chart(fig, use_container_width=True)
+            fig = criar_grafico_medias(df_medias)
+            with medir("renderizar_grafico"):
+                st.plotly_chart(fig, use_container_width=True)
 
     with tab2:
         st.subheader("Tabela de Médias Gerais")
         if not df_medias.empty:
             st.dataframe(df_medias.style.apply(estilo_semaforo, axis=1).format({'Pontuação Média': "{:.2f}"}), use_container_width=True)
 
+    with tab3:
+        st.subheader("Distribuição por Dimensão")
+        st.caption("Desvio-padrão, quartis, intervalo de confiança de 95% da média (bootstrap) e percentagem de respondentes em cada faixa do semáforo.")
+        # Precisa das respostas individuais, por isso só é calculado a pedido; o resultado fica em cache por versão dos dados.
+        if st.button("📈 Calcular Estatísticas Detalhadas"):
+            st.session_state.calcular_resumo = True
+        if st.session_state.get('calcular_resumo'):
+            linhas = agregador.linhas_processadas
+            def pontuacoes_filtradas():
+                df = carregar_versao(armazenamento, linhas)
+                for campo, valor in filtros.items():
+                    df = df[df[campo] == valor] if campo in df.columns else df.iloc[0:0]
+                return df.reindex(columns=list(motor.definicao_dimensoes.keys()))
+            try:
+                resumo = cache_de_resumos.obter((linhas, tuple(sorted(filtros.items()))), pontuacoes_filtradas)
+            except ErroCarregamento as e:
+                st.warning(str(e))
+            else:
+                st.dataframe(resumo.style.format("{:.1f}").format({'n': "{:.0f}"}), use_container_width=True)
+
+    with tab4:
+        st.subheader("Evolução entre Ondas")
+        # As comparações usam só os instantâneos gravados (contagens, somas e faixas), nunca as respostas individuais.
+        repositorio = obter_repositorio_ondas()
+        ondas_registadas = agregador.segmentos.valores("Onda")
+        with st.expander("📸 Guardar instantâneo de uma onda"):
+            if not ondas_registadas:
+                st.info("As respostas ainda não têm o campo 'Onda' preenchido (use o parâmetro ?onda=... no link do questionário).")
+            else:
+                col_empresa, col_onda = st.columns(2)
+                empresa = col_empresa.selectbox("Empresa", ["Todas"] + agregador.segmentos.valores("Empresa"), key="instantaneo_empresa")
+                onda = col_onda.selectbox("Onda", ondas_registadas, key="instantaneo_onda")
+                st.caption("Um instantâneo não pode ser alterado depois de guardado; guarde-o quando a onda estiver encerrada.")
+                if st.button("📸 Guardar instantâneo"):
+                    try:
+                        repositorio.guardar(criar_instantaneo(agregador.segmentos, "" if empresa == "Todas" else empresa, onda))
+                        st.success(f"Instantâneo da onda '{onda}' guardado.")
+                    except (ValueError, FileExistsError) as e:
+                        st.warning(str(e))
+
+        empresas_com_ondas = repositorio.empresas()
+        if not empresas_com_ondas:
+            st.info("Ainda não há instantâneos guardados.")
+        else:
+            empresa = st.selectbox("Empresa a comparar", empresas_com_ondas, format_func=lambda e: e or "Todas", key="comparar_empresa")
+            instantaneos = repositorio.listar(empresa)
+            if len(instantaneos) < 2:
+                st.info("São precisas pelo menos duas ondas guardadas desta empresa para comparar.")
+            else:
+                nomes = [i.onda for i in instantaneos]
+                col_anterior, col_atual = st.columns(2)
+                anterior = col_anterior.selectbox("Onda anterior", nomes, index=len(nomes) - 2, key="comparar_anterior")
+                atual = col_atual.selectbox("Onda atual", nomes, index=len(nomes) - 1, key="comparar_atual")
+                por_onda = {i.onda: i for i in instantaneos}
+                comparacao = comparar_ondas(por_onda[anterior], por_onda[atual])
+                st.caption("Diferença = média da onda atual menos a da anterior. 'p (médias)': teste t de Welch; 'p (faixas)': qui-quadrado da distribuição pelas faixas do semáforo.")
+                st.dataframe(comparacao.style.format("{:.2f}", subset=comparacao.columns[:3]).format("{:.3f}", subset=['p (médias)', 'p (faixas)']), use_container_width=True)
+                st.markdown("**Médias por onda**")
+                st.line_chart(evolucao_das_medias(instantaneos).T)
+                with st.expander("Todas as mudanças entre ondas consecutivas"):
+                    st.dataframe(diferencas_consecutivas(instantaneos), use_container_width=True, hide_index=True)
+
+    carregador_clientes = obter_carregador_clientes()
+    if carregador_clientes is not None:
+        st.divider()
+        st.header("🏢 Visão Consolidada dos Clientes")
+        # As planilhas dos clientes só são lidas ao clicar (em paralelo, e só as que mudaram desde a
+        # última carga); nos outros reruns mostra-se a última carga, sem chamar o Drive.
+        forcar = st.checkbox("Forçar releitura completa (depois de corrigir linhas à mão numa planilha)", key="forcar_releitura_clientes")
+        if st.button("🔄 Carregar Planilhas dos Clientes"):
+            with st.spinner(f"A ler {len(carregador_clientes.clientes)} planilhas..."):
+                carregador_clientes.carregar(forcar=forcar)
+        df_clientes = carregador_clientes.consolidado
+        if df_clientes is not None:
+            st.caption(f"Última leitura concluída em {carregador_clientes.segundos_da_ultima_carga:.1f} s.")
+            if not df_clientes.empty:
+                dimensoes = [dimensao for dimensao in motor.definicao_dimensoes if dimensao in df_clientes.columns]
+                grupos = df_clientes.groupby(df_clientes["Cliente"].astype(str))
+                medias_clientes = grupos[dimensoes].mean().T
+                respostas_por_cliente = grupos.size()
+                pequenos = grupos_a_suprimir(respostas_por_cliente.to_dict(), TAMANHO_MINIMO_GRUPO)
+                medias_clientes = medias_clientes.drop(columns=pequenos)
+                if pequenos:
+                    st.warning(f"Para preservar o anonimato, não são mostrados os clientes com menos de {TAMANHO_MINIMO_GRUPO} respostas nem os necessários para que estes não se deduzam por diferença: {', '.join(map(str, pequenos))}.")
+                st.dataframe(medias_clientes.style.format("{:.1f}"), use_container_width=True)
+            with st.expander("Estado de cada planilha"):
+                st.dataframe(pd.DataFrame({"Estado": carregador_clientes.estado_da_ultima_carga}), use_container_width=True)
+
     st.divider()
     st.header("📄 Exportar Relatório e Dados")
     st.info("Para incluir um logo no relatório PDF, cole o URL da imagem no campo abaixo.")
@@ -313,13 +444,32 @@ def pagina_do_administrador():
     st.text_input("URL do Logo (opcional):", key="logo_url", placeholder="https://exemplo.com/logo.png")
     col1, col2 = st.columns(2)
     with col1:
-        if not df_medias.empty:
-            pdf_bytes = gerar_relatorio_pdf(df_medias, total_respostas, st.session_state.logo_url)
-            st.download_button(label="📥 Gerar e Descarregar Relatório (.pdf)", data=pdf_bytes, file_name=f'relatorio_copsoq_br_{datetime.now().strftime("%Y%m%d")}.pdf', mime='application/pdf', use_container_width=True, type="primary")
+        # O PDF só é gerado a pedido; depois disso vem da cache enquanto os dados e o logo não mudarem.
+        if st.button("📄 Gerar Relatório (.pdf)", use_container_width=True):
+            st.session_state.gerar_pdf = True
+        if st.session_state.get('gerar_pdf') and not df_medias.empty:
+            logo_png = None
+            try:
+                logo_png = obter_logo(st.session_state.logo_url)
+            except ErroLogo as e:
+                st.warning(f"{e} O PDF será gerado sem ele.")
+            pdf_bytes = obter_relatorio_pdf(df_medias, total_respostas, logo_png)
+            st.download_button(label="📥 Descarregar Relatório (.pdf)", data=pdf_bytes, file_name=f'relatorio_copsoq_br_{datetime.now().strftime("%Y%m%d")}.pdf', mime='application/pdf', use_container_width=True, type="primary")
     with col2:
-        if not df.empty:
-            csv = df.to_csv(index=False).encode('utf-8')
-            st.download_button(label="💾 Descarregar Dados Brutos (.csv)", data=csv, file_name='dados_brutos_copsoq_br.csv', mime='text/csv', use_container_width=True)
+        # Os dados brutos só são lidos e convertidos quando o consultor os pede; o ficheiro fica em cache por versão dos dados.
+        formato = st.selectbox("Formato dos dados brutos", list(FORMATOS), key="formato_exportacao")
+        if st.button("📂 Preparar Dados Brutos", use_container_width=True):
+            st.session_state.preparar_dados = True
+        if st.session_state.get('preparar_dados'):
+            # A versão é o número de linhas do agregador; as respostas só são lidas se o ficheiro não estiver em cache.
+            linhas = agregador.linhas_processadas
+            _, extensao, mime = FORMATOS[formato]
+            try:
+                dados = obter_exportacao(linhas, formato, lambda: carregar_versao(armazenamento, linhas))
+            except ErroCarregamento as e:
+                st.warning(str(e))
+            else:
+                st.download_button(label=f"💾 Descarregar Dados Brutos (.{extensao})", data=dados, file_name=f'dados_brutos_copsoq_br.{extensao}', mime=mime, use_container_width=True)
 
 
 # --- ROTEADOR PRINCIPAL DA APLICAÇÃO ---
@@ -0,0 +1,184 @@
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime
+
+import gspread
+import pandas as pd
+
+import calculadora_copsoq_br as motor
+from instrumentacao import medir
+
+# Cabeçalho das linhas gravadas: Timestamp, respostas, pontuações das dimensões e segmentos.
+# Os segmentos vêm no fim para que planilhas antigas (sem essas colunas) continuem válidas.
+CABECALHO = ["Timestamp"] + motor.chaves_perguntas + list(motor.definicao_dimensoes.keys()) + motor.campos_segmento
+COLUNAS_NUMERICAS = list(motor.definicao_dimensoes.keys())
+
+
+def montar_linha(dados, momento=None):
+    """Converte o dicionário de respostas e pontuações numa linha na ordem do CABECALHO."""
+    momento = momento or datetime.now()
+    return [momento.strftime("%Y-%m-%d %H:%M:%S")] + [dados.get(coluna) for coluna in CABECALHO[1:]]
+
+
+def tipar_dataframe(df):
+    """Converte as colunas de pontuação para números (aceitando vírgula decimal, como na planilha)."""
+    for coluna in COLUNAS_NUMERICAS:
+        if coluna in df.columns and not pd.api.types.is_numeric_dtype(df[coluna]):
+            df[coluna] = pd.to_numeric(df[coluna].astype(str).str.replace(',', '.', regex=False), errors='coerce')
+    return df
+
+
+class ArmazenamentoRespostas(ABC):
+    """Interface comum para onde as respostas do questionário são gravadas e lidas."""
+
+    cabecalho = CABECALHO
+
+    @property
+    def origem(self):
+        """Identifica de onde vêm as linhas (guardado com o estado dos agregados)."""
+        return type(self).__name__
+
+    def salvar(self, linha):
+        """Grava uma única linha (na ordem do CABECALHO)."""
+        return self.salvar_lote([linha])
+
+    @abstractmethod
+    def salvar_lote(self, linhas):
+        """Grava várias linhas de uma só vez. Devolve True em caso de sucesso."""
+
+    @abstractmethod
+    def ler_linhas(self, inicio=0):
+        """Devolve as linhas de dados a partir da posição 'inicio' (0 = primeira resposta)."""
+
+    @abstractmethod
+    def carregar(self):
+        """Devolve todas as respostas num DataFrame, com as pontuações já numéricas."""
+
+
+class ArmazenamentoGoogleSheets(ArmazenamentoRespostas):
+    """
+    Grava na primeira folha de uma Planilha Google, através de um cliente gspread.
+    Com 'id_planilha' abre-a diretamente pelo id, sem procurar o nome no Drive.
+    """
+
+    def __init__(self, gc, nome_planilha, id_planilha=None):
+        self.gc = gc
+        self.nome_planilha = nome_planilha
+        self.id_planilha = id_planilha
+        self._worksheet = None
+        self._cabecalho_verificado = False
+        self._lock = threading.Lock()
+
+    @property
+    def worksheet(self):
+        if self._worksheet is None:
+            with medir("abrir_planilha"):
+                planilha = self.gc.open_by_key(self.id_planilha) if self.id_planilha else self.gc.open(self.nome_planilha)
+                self._worksheet = planilha.sheet1
+        return self._worksheet
+
+    @property
+    def origem(self):
+        return f"sheets:{self.id_planilha or self.nome_planilha}"
+
+    @property
+    def ultima_coluna(self):
+        return gspread.utils.rowcol_to_a1(1, len(self.cabecalho)).rstrip('1')
+
+    def _garantir_cabecalho(self):
+        # Lê apenas a primeira linha, e só uma vez por instância.
+        with self._lock:
+            if self._cabecalho_verificado:
+                return
+            cabecalho_atual = self.worksheet.row_values(1)
+            # Também completa cabeçalhos antigos, gravados antes das colunas de segmento.
+            if len(cabecalho_atual) < len(self.cabecalho) and cabecalho_atual == self.cabecalho[:len(cabecalho_atual)]:
+                self.worksheet.update(range_name='A1', values=[self.cabecalho])
+            self._cabecalho_verificado = True
+
+    def salvar_lote(self, linhas):
+        if not linhas:
+            return True
+        self._garantir_cabecalho()
+        valores = [[str(v) if v is not None else "" for v in linha] for linha in linhas]
+        response = self.worksheet.append_rows(valores)
+        if isinstance(response, dict) and "updates" in response:
+            return True
+        raise TypeError(f"A resposta da API do Google não foi a esperada. Resposta recebida: {response}")
+
+    def ler_linhas(self, inicio=0):
+        worksheet = self.worksheet
+        with medir("sheets.ler_linhas", a_partir_da_linha=inicio) as medicao:
+            linhas = worksheet.get(f"A{inicio + 2}:{self.ultima_coluna}")
+            medicao.anotar(linhas=len(linhas))
+        return linhas
+
+    def carregar(self):
+        worksheet = self.worksheet
+        with medir("sheets.get_all_values") as medicao:
+            todos_os_valores = worksheet.get_all_values()
+            medicao.anotar(linhas=len(todos_os_valores))
+        if len(todos_os_valores) < 2:
+            return pd.DataFrame()
+        with medir("montar_dataframe", linhas=len(todos_os_valores) - 1):
+            dados = todos_os_valores[1:]
+            num_cols_data = len(dados[0])
+            df = pd.DataFrame(dados, columns=self.cabecalho[:num_cols_data])
+            return tipar_dataframe(df)
+
+
+class ArmazenamentoSQLite(ArmazenamentoRespostas):
+    """
+    Grava numa base SQLite local em modo WAL, com as pontuações em colunas REAL.
+    Útil para instalações sem Google Sheets e para testes de carga offline.
+    """
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self._lock = threading.Lock()
+        pasta = os.path.dirname(caminho)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+        self._conexao = sqlite3.connect(caminho, check_same_thread=False)
+        self._conexao.execute("PRAGMA journal_mode=WAL")
+        self._conexao.execute("PRAGMA synchronous=NORMAL")
+        tipos = {c: "REAL" if c in COLUNAS_NUMERICAS else "TEXT" for c in self.cabecalho}
+        colunas = [f'"{c}" {tipo}' for c, tipo in tipos.items()]
+        with self._conexao:
+            self._conexao.execute(f"CREATE TABLE IF NOT EXISTS respostas (id INTEGER PRIMARY KEY AUTOINCREMENT, {', '.join(colunas)})")
+            existentes = {linha[1] for linha in self._conexao.execute("PRAGMA table_info(respostas)")}
+            for coluna, tipo in tipos.items():
+                if coluna not in existentes:
+                    self._conexao.execute(f'ALTER TABLE respostas ADD COLUMN "{coluna}" {tipo}')
+        self._colunas_sql = ", ".join(f'"{c}"' for c in self.cabecalho)
+        self._marcadores = ", ".join("?" for _ in self.cabecalho)
+
+    @property
+    def origem(self):
+        return f"sqlite:{os.path.abspath(self.caminho)}"
+
+    def salvar_lote(self, linhas):
+        if not linhas:
+            return True
+        with self._lock, self._conexao:
+            self._conexao.executemany(f"INSERT INTO respostas ({self._colunas_sql}) VALUES ({self._marcadores})", linhas)
+        return True
+
+    def ler_linhas(self, inicio=0):
+        # As respostas nunca são apagadas, por isso o id AUTOINCREMENT coincide com a posição + 1.
+        with self._lock, medir("sqlite.ler_linhas", a_partir_da_linha=inicio) as medicao:
+            cursor = self._conexao.execute(f"SELECT {self._colunas_sql} FROM respostas WHERE id > ? ORDER BY id", (inicio,))
+            linhas = [list(linha) for linha in cursor.fetchall()]
+            medicao.anotar(linhas=len(linhas))
+            return linhas
+
+    def carregar(self):
+        with self._lock, medir("sqlite.carregar") as medicao:
+            df = pd.read_sql_query(f"SELECT {self._colunas_sql} FROM respostas ORDER BY id", self._conexao)
+            medicao.anotar(linhas=len(df))
+        return tipar_dataframe(df) if not df.empty else pd.DataFrame()
+
+    def fechar(self):
+        self._conexao.close()
@@ -0,0 +1,41 @@
+"""
+Compara o custo por respondente de 'calcular_dimensoes' (um a um) com
+'calcular_dimensoes_lote' (vetorizado).
+
+Uso: python benchmark_calculadora.py [--linhas 100000] [--semente 42]
+"""
+import argparse
+import time
+
+import calculadora_copsoq_br as motor
+from dados_sinteticos import gerar_respostas_sinteticas, respostas_como_registros
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--linhas", type=int, default=100_000)
+    parser.add_argument("--semente", type=int, default=42)
+    args = parser.parse_args()
+
+    df = gerar_respostas_sinteticas(args.linhas, args.semente)
+    registros = respostas_como_registros(df)
+
+    inicio = time.perf_counter()
+    individuais = [motor.calcular_dimensoes(registro) for registro in registros]
+    tempo_individual = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    lote = motor.calcular_dimensoes_lote(df)
+    tempo_lote = time.perf_counter() - inicio
+
+    if motor.pontuacoes_para_registros(lote) != individuais:
+        raise SystemExit("Erro: os resultados em lote diferem do cálculo individual.")
+
+    print(f"Respondentes: {args.linhas}")
+    print(f"calcular_dimensoes:      {tempo_individual:8.3f} s  ({tempo_individual / args.linhas * 1e6:8.2f} µs/linha)")
+    print(f"calcular_dimensoes_lote: {tempo_lote:8.3f} s  ({tempo_lote / args.linhas * 1e6:8.2f} µs/linha)")
+    print(f"Aceleração: {tempo_individual / tempo_lote:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""
+Benchmark e teste de carga das etapas de pontuação, agregação do painel, PDF e exportação.
+
+Uso:
+    python benchmark_copsoq.py --tamanhos 1000,10000,100000,1000000 --saida resultados.json
+    python benchmark_copsoq.py --tamanhos 10000 --comparar resultados_anteriores.json
+
+Para cada tamanho mede o tempo e o pico de memória (tracemalloc) de cada etapa. O ciclo
+completo de envio e leitura usa uma planilha falsa em memória no lugar do gspread.
+Os resultados são gravados em JSON para comparar versões.
+
+Os dados sintéticos (de 'dados_sinteticos') ficam em colunas compactas e o agregador
+incremental recebe as linhas em blocos, para que o patamar de 1 milhão caiba em memória.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import calculadora_copsoq_br as motor
+from agregados_incrementais import AgregadorIncremental
+from armazenamento import ArmazenamentoGoogleSheets, montar_linha, tipar_dataframe
+from dados_sinteticos import gerar_dataframe_planilha, gerar_respostas_sinteticas, linhas_da_planilha, respostas_como_registros
+from fila_de_gravacao import GravadorEmLote
+from planilha_falsa import ClienteFalso
+from relatorio_pdf import gerar_relatorio_pdf, tabela_de_medias
+
+TAMANHO_BLOCO = 50_000
+
+
+def medir(funcao, com_memoria=True):
+    """Executa 'funcao' e devolve (segundos, pico de memória em MB ou None)."""
+    inicio = time.perf_counter()
+    funcao()
+    segundos = time.perf_counter() - inicio
+    pico = None
+    if com_memoria:
+        tracemalloc.start()
+        try:
+            funcao()
+            pico = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+        finally:
+            tracemalloc.stop()
+    return segundos, pico
+
+
+def executar_etapas(linhas, amostra_individual, submissoes, com_memoria):
+    respostas = gerar_respostas_sinteticas(linhas)
+    df_planilha = gerar_dataframe_planilha(respostas)
+    resultados = []
+
+    def registar(etapa, segundos, pico, n):
+        resultados.append({
+            "etapa": etapa,
+            "linhas": linhas,
+            "linhas_medidas": n,
+            "segundos": round(segundos, 6),
+            "us_por_linha": round(segundos / n * 1e6, 3) if n else None,
+            "pico_memoria_mb": round(pico, 3) if pico is not None else None,
+        })
+        memoria = f"{pico:8.1f} MB" if pico is not None else "       -"
+        print(f"  {etapa:<28} {segundos:9.3f} s  {segundos / n * 1e6 if n else 0:9.2f} µs/linha  {memoria}", file=sys.stderr)
+
+    # Pontuação individual: em volumes grandes mede-se uma amostra e reporta-se o custo por linha.
+    amostra = respostas_como_registros(respostas.head(min(linhas, amostra_individual)))
+    registar("calcular_dimensoes", *medir(lambda: [motor.calcular_dimensoes(r) for r in amostra], com_memoria), len(amostra))
+    registar("calcular_dimensoes_lote", *medir(lambda: motor.calcular_dimensoes_lote(respostas), com_memoria), linhas)
+
+    # Agregação do painel: caminho antigo (DataFrame completo) e agregador incremental.
+    def agregacao_dataframe():
+        df = tipar_dataframe(df_planilha.copy())
+        return df[list(motor.definicao_dimensoes)].mean()
+    registar("agregacao_dataframe", *medir(agregacao_dataframe, com_memoria), linhas)
+
+    with tempfile.TemporaryDirectory() as pasta:
+        def agregacao_incremental():
+            # Como na aplicação, as linhas chegam da planilha em blocos; a conversão de cada bloco conta no tempo.
+            agregador = AgregadorIncremental(os.path.join(pasta, "agregados.json"), intervalo_minimo=0)
+            agregador.redefinir()
+            while agregador.atualizar(lambda inicio: linhas_da_planilha(df_planilha, inicio, inicio + TAMANHO_BLOCO), forcar=True):
+                pass
+            return agregador.medias()
+        registar("agregacao_incremental", *medir(agregacao_incremental, com_memoria), linhas)
+
+    medias = agregacao_dataframe()
+    registar("gerar_relatorio_pdf", *medir(lambda: gerar_relatorio_pdf(tabela_de_medias(medias), linhas), com_memoria), linhas)
+    registar("exportar_csv", *medir(lambda: df_planilha.to_csv(index=False).encode("utf-8"), com_memoria), linhas)
+
+    # Ciclo de envio e leitura com a planilha falsa: N envios pelo gravador em lote e uma leitura completa.
+    n_envios = min(linhas, submissoes)
+    registros = [motor.calcular_registro(r) for r in respostas_como_registros(respostas.head(n_envios))]
+
+    def ciclo_submissao():
+        with tempfile.TemporaryDirectory() as pasta:
+            armazenamento = ArmazenamentoGoogleSheets(ClienteFalso(), "Benchmark")
+            gravador = GravadorEmLote(armazenamento, os.path.join(pasta, "spool.jsonl"), intervalo=0.05)
+            for registro in registros:
+                gravador.enviar(montar_linha(registro))
+            gravador.parar()
+            df = armazenamento.carregar()
+            if len(df) != len(registros):
+                raise RuntimeError(f"Ciclo de envio perdeu respostas: {len(df)} de {len(registros)} gravadas.")
+            return df
+    registar("ciclo_envio_e_leitura", *medir(ciclo_submissao, com_memoria), n_envios)
+    return resultados
+
+
+def versao_do_codigo():
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def comparar(atuais, caminho_anterior):
+    with open(caminho_anterior, encoding="utf-8") as ficheiro:
+        anteriores = {(r["etapa"], r["linhas"]): r for r in json.load(ficheiro)["resultados"]}
+    print(f"\nComparação com {caminho_anterior} (tempo atual / anterior):", file=sys.stderr)
+    for resultado in atuais:
+        anterior = anteriores.get((resultado["etapa"], resultado["linhas"]))
+        if anterior and anterior["segundos"]:
+            razao = resultado["segundos"] / anterior["segundos"]
+            aviso = "  <-- mais lento" if razao > 1.2 else ""
+            print(f"  {resultado['etapa']:<28} {resultado['linhas']:>9}  {razao:6.2f}x{aviso}", file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark das etapas de pontuação, painel, PDF e exportação.")
+    parser.add_argument("--tamanhos", default="1000,10000,100000", help="Números de respostas, separados por vírgula.")
+    parser.add_argument("--amostra-individual", type=int, default=20_000, help="Máximo de linhas para o cálculo um a um.")
+    parser.add_argument("--submissoes", type=int, default=2_000, help="Máximo de envios no ciclo com a planilha falsa.")
+    parser.add_argument("--sem-memoria", action="store_true", help="Não medir o pico de memória (mais rápido).")
+    parser.add_argument("--saida", help="Ficheiro JSON de resultados (por omissão, stdout).")
+    parser.add_argument("--comparar", help="JSON de uma execução anterior para comparar tempos.")
+    args = parser.parse_args(argv)
+
+    resultados = []
+    for tamanho in (int(t) for t in args.tamanhos.split(",")):
+        print(f"{tamanho} respostas:", file=sys.stderr)
+        resultados.extend(executar_etapas(tamanho, args.amostra_individual, args.submissoes, not args.sem_memoria))
+
+    relatorio = {
+        "versao": versao_do_codigo(),
+        "data": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "resultados": resultados,
+    }
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as ficheiro:
+            json.dump(relatorio, ficheiro, ensure_ascii=False, indent=2)
+    else:
+        print(json.dumps(relatorio, ensure_ascii=False, indent=2))
+    if args.comparar:
+        comparar(resultados, args.comparar)
+
+
+if __name__ == "__main__":
+    main()
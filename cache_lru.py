@@ -0,0 +1,44 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class CacheLRU:
+    """
+    Cache LRU simples e segura entre threads, limitada pelo tamanho total dos valores em bytes.
+    Com 'validade' (segundos), cada entrada expira esse tempo depois de guardada.
+    """
+
+    def __init__(self, limite_bytes, validade=None):
+        self.limite_bytes = limite_bytes
+        self.validade = validade
+        self._itens = OrderedDict()
+        self._total = 0
+        self._lock = threading.Lock()
+
+    def obter(self, chave):
+        with self._lock:
+            if chave not in self._itens:
+                return None
+            valor, guardado_em = self._itens[chave]
+            if self.validade is not None and time.monotonic() - guardado_em > self.validade:
+                del self._itens[chave]
+                self._total -= len(valor)
+                return None
+            self._itens.move_to_end(chave)
+            return valor
+
+    def guardar(self, chave, valor):
+        with self._lock:
+            if chave in self._itens:
+                self._total -= len(self._itens.pop(chave)[0])
+            self._itens[chave] = (valor, time.monotonic())
+            self._total += len(valor)
+            while self._total > self.limite_bytes and len(self._itens) > 1:
+                _, (removido, _) = self._itens.popitem(last=False)
+                self._total -= len(removido)
+
+    def limpar(self):
+        with self._lock:
+            self._itens.clear()
+            self._total = 0
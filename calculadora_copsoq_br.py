@@ -1,44 +1,31 @@
 import statistics
 
-# Dicionário que converte a resposta em texto para uma pontuação de 0 a 100
-pontuacao_map = {
-    "Nunca": 0,
-    "Raramente": 25,
-    "Às vezes": 50,
-    "Frequentemente": 75,
-    "Sempre": 100,
-    # Adicionar outras escalas se necessário, ex: para a pergunta de Saúde Geral
-    "Muito ruim": 0, "Ruim": 25, "Razoável": 50, "Boa": 75, "Muito boa": 100,
-    None: None
-}
+import numpy as np
+import pandas as pd
+
+import esquema_copsoq as esquema
+
+# Dicionário que converte a resposta em texto para uma pontuação de 0 a 100.
+# As escalas, dimensões e perguntas vêm do esquema versionado em 'esquema_copsoq'.
+pontuacao_map = esquema.PONTUACAO_POR_ROTULO
 
 # Definição das dimensões e quais perguntas pertencem a cada uma,
 # conforme a versão curta validada para o Brasil.
-definicao_dimensoes = {
-    "Ritmo de Trabalho": ["Q1", "Q2"],
-    "Exigências Cognitivas": ["Q3", "Q4"],
-    "Exigências Emocionais": ["Q5", "Q6"],
-    "Influência": ["Q7", "Q8"],
-    "Possibilidades de Desenvolvimento": ["Q9", "Q10"],
-    "Sentido do Trabalho": ["Q11", "Q12"],
-    "Comprometimento com o Local de Trabalho": ["Q13", "Q14"],
-    "Previsibilidade": ["Q15", "Q16"],
-    "Clareza de Papel": ["Q17"],
-    "Conflito de Papel": ["Q18"],
-    "Qualidade da Liderança": ["Q19", "Q20"],
-    "Apoio Social do Superior": ["Q21"],
-    "Apoio Social dos Colegas": ["Q22"],
-    "Sentido de Comunidade": ["Q23"],
-    "Insegurança no Emprego": ["Q24"],
-    "Conflito Trabalho-Família": ["Q25"],
-    "Satisfação no Trabalho": ["Q26"],
-    "Saúde em Geral": ["Q27"],
-    "Burnout": ["Q28"],
-    "Estresse": ["Q29"],
-    "Problemas de Sono": ["Q30"],
-    "Sintomas Depressivos": ["Q31"],
-    "Assédio Moral": ["Q32"],
-}
+definicao_dimensoes = esquema.PERGUNTAS_POR_DIMENSAO
+
+# Chaves das 32 perguntas, na ordem em que são guardadas.
+chaves_perguntas = list(esquema.CHAVES_PERGUNTAS)
+
+# Campos opcionais que identificam o grupo do respondente, para análises segmentadas.
+campos_segmento = ["Empresa", "Setor", "Unidade", "Onda"]
+
+# --- TABELAS PRÉ-COMPILADAS PARA O CÁLCULO EM LOTE ---
+# Cada rótulo do 'pontuacao_map' recebe um código inteiro; respostas ausentes ou
+# desconhecidas ficam com o código -1 (equivalente ao None do cálculo individual).
+_rotulos = [rotulo for rotulo in pontuacao_map if rotulo is not None]
+_pontuacoes_por_codigo = np.array([pontuacao_map[rotulo] for rotulo in _rotulos], dtype=np.float64)
+_codigo_por_rotulo = {rotulo: codigo for codigo, rotulo in enumerate(_rotulos)}
+_codificar = np.frompyfunc(_codigo_por_rotulo.get, 2, 1)
 
 def calcular_dimensoes(respostas_usuario):
     """
@@ -61,3 +48,62 @@ def calcular_dimensoes(respostas_usuario):
             
     return resultados_finais
 
+
+def calcular_registro(respostas_usuario, segmentos=None):
+    """
+    Junta as respostas, as pontuações das dimensões e os campos de segmento
+    (Empresa, Setor, Unidade, Onda) num único registo pronto a gravar.
+    Segmentos não informados ficam com None.
+    """
+    segmentos = segmentos or {}
+    registro = {**respostas_usuario, **calcular_dimensoes(respostas_usuario)}
+    for campo in campos_segmento:
+        valor = segmentos.get(campo)
+        registro[campo] = valor.strip() if isinstance(valor, str) and valor.strip() else None
+    return registro
+
+
+def codificar_respostas(respostas):
+    """
+    Converte respostas em texto para uma matriz (N x 32) de códigos inteiros.
+    Aceita um DataFrame com colunas 'Q1'...'Q32' ou uma matriz de rótulos.
+    Respostas ausentes ou fora do 'pontuacao_map' recebem o código -1.
+    """
+    if isinstance(respostas, pd.DataFrame):
+        matriz = respostas.reindex(columns=chaves_perguntas).to_numpy(dtype=object)
+    else:
+        matriz = np.asarray(respostas, dtype=object)
+        if matriz.ndim != 2 or matriz.shape[1] != len(chaves_perguntas):
+            raise ValueError(f"Esperada uma matriz (N x {len(chaves_perguntas)}), recebido o formato {matriz.shape}.")
+    return _codificar(matriz, -1).astype(np.int8)
+
+
+def calcular_medias_lote(codigos):
+    """
+    Calcula a média de cada dimensão como média mascarada sobre a matriz de códigos.
+    Devolve uma matriz (N x n_dimensões) de floats, com NaN onde não há respostas válidas.
+    """
+    validos = codigos >= 0
+    pontuacoes = np.where(validos, _pontuacoes_por_codigo[np.maximum(codigos, 0)], 0.0)
+    somas = pontuacoes @ esquema.MATRIZ_DIMENSOES
+    contagens = validos.astype(np.float64) @ esquema.MATRIZ_DIMENSOES
+    with np.errstate(invalid="ignore", divide="ignore"):
+        medias = somas / contagens
+    return np.round(medias, 2)
+
+
+def calcular_dimensoes_lote(respostas):
+    """
+    Versão em lote de 'calcular_dimensoes' para muitos respondentes de uma só vez.
+    Devolve um DataFrame de floats com uma coluna por dimensão (mesmo índice da entrada, se
+    for um DataFrame); dimensões sem respostas válidas ficam com NaN. Use
+    'pontuacoes_para_registros' para obter dicionários com None, como no cálculo individual.
+    """
+    medias = calcular_medias_lote(codificar_respostas(respostas))
+    indice = respostas.index if isinstance(respostas, pd.DataFrame) else None
+    return pd.DataFrame(medias, columns=list(definicao_dimensoes.keys()), index=indice)
+
+
+def pontuacoes_para_registros(pontuacoes):
+    """Converte o DataFrame de 'calcular_dimensoes_lote' numa lista de dicionários, com None onde há NaN."""
+    return pontuacoes.astype(object).where(pontuacoes.notna(), None).to_dict(orient="records")
@@ -0,0 +1,144 @@
+"""
+Carrega as respostas de várias planilhas de clientes (uma por cliente) em paralelo e junta-as
+num único DataFrame tipado, com uma coluna 'Cliente'.
+
+Uma única listagem do Drive dá a data de modificação de todas as planilhas; as que não mudaram
+desde a última carga não são lidas. Das que mudaram, lêem-se apenas as linhas acrescentadas
+(as respostas só são acrescentadas, nunca editadas). Use 'carregar(forcar=True)' (no painel,
+a opção 'Forçar releitura completa') depois de corrigir linhas à mão numa planilha.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import gspread
+import pandas as pd
+from requests.adapters import HTTPAdapter
+
+from armazenamento import CABECALHO, ArmazenamentoGoogleSheets, tipar_dataframe
+from instrumentacao import medir
+
+logger = logging.getLogger(__name__)
+
+MAX_TRABALHADORES = 8
+
+
+def cliente_dedicado(gc, maximo=MAX_TRABALHADORES):
+    """
+    Devolve um cliente gspread com as mesmas credenciais de 'gc' mas com uma sessão HTTP só sua,
+    com um pool de no máximo 'maximo' ligações (os pedidos acima disso esperam por uma ligação
+    livre). A sessão de 'gc', partilhada pelo resto da aplicação, não é alterada.
+    Os clientes falsos, sem sessão HTTP, são devolvidos tal como estão.
+    """
+    http_client = getattr(gc, "http_client", None)
+    if getattr(http_client, "session", None) is None:
+        return gc
+    cliente = gspread.Client(http_client.auth, http_client=type(http_client))
+    cliente.http_client.timeout = http_client.timeout
+    cliente.http_client.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=maximo, pool_block=True))
+    return cliente
+
+
+class _EstadoCliente:
+    """O que já foi lido de uma planilha: data de modificação, linhas e o DataFrame correspondente."""
+
+    def __init__(self, armazenamento):
+        self.armazenamento = armazenamento
+        self.modificada_em = None
+        self.linhas = []
+        self.df = None
+
+
+class CarregadorMultiplasPlanilhas:
+    """
+    'clientes' é um dicionário {cliente: nome da planilha}. As planilhas são lidas com um
+    ThreadPoolExecutor de 'max_trabalhadores' threads, a partilhar um cliente gspread próprio
+    (ver 'cliente_dedicado'), com as credenciais de 'gc'.
+    """
+
+    def __init__(self, gc, clientes, max_trabalhadores=MAX_TRABALHADORES, cabecalho=CABECALHO):
+        self.gc = cliente_dedicado(gc, max_trabalhadores)
+        self.clientes = dict(clientes)
+        self.max_trabalhadores = max_trabalhadores
+        self.cabecalho = list(cabecalho)
+        self.estado_da_ultima_carga = {}
+        self.segundos_da_ultima_carga = None
+        self._estados = {}
+        self._consolidado = None
+        self._lock = threading.Lock()
+
+    def _ler_cliente(self, cliente, ficheiro, forcar):
+        """Lê as linhas novas de um cliente e devolve uma descrição do que aconteceu."""
+        estado = self._estados.get(cliente)
+        if estado is None or estado.armazenamento.id_planilha != ficheiro["id"]:
+            armazenamento = ArmazenamentoGoogleSheets(self.gc, ficheiro["name"], id_planilha=ficheiro["id"])
+            estado = self._estados[cliente] = _EstadoCliente(armazenamento)
+        if forcar:
+            estado.linhas, estado.df, estado.modificada_em = [], None, None
+        if estado.modificada_em == ficheiro["modifiedTime"] and estado.df is not None:
+            return "inalterada"
+        with medir("carregar_cliente", cliente=cliente) as medicao:
+            novas = estado.armazenamento.ler_linhas(len(estado.linhas))
+            medicao.anotar(linhas=len(novas))
+        if novas or estado.df is None:
+            # O estado só muda se o DataFrame for montado: uma falha aqui faz reler estas linhas.
+            linhas = estado.linhas + novas
+            estado.df = self._montar_dataframe(cliente, linhas)
+            estado.linhas = linhas
+        estado.modificada_em = ficheiro["modifiedTime"]
+        return f"{len(novas)} linhas novas"
+
+    def _montar_dataframe(self, cliente, linhas):
+        # A API não devolve as células vazias no fim de cada linha: completa-se até à largura do cabeçalho.
+        largura = len(self.cabecalho)
+        dados = [list(linha[:largura]) + [""] * (largura - len(linha)) for linha in linhas]
+        df = tipar_dataframe(pd.DataFrame(dados, columns=self.cabecalho))
+        df.insert(0, "Cliente", cliente)
+        return df
+
+    def carregar(self, forcar=False):
+        """
+        Devolve o DataFrame consolidado de todos os clientes. As falhas de um cliente não
+        impedem os restantes: ficam em 'estado_da_ultima_carga' e mantém-se a última leitura boa.
+        """
+        with self._lock:
+            inicio = time.perf_counter()
+            with medir("listar_planilhas"):
+                ficheiros = {ficheiro["name"]: ficheiro for ficheiro in self.gc.list_spreadsheet_files()}
+            estado_da_carga = {}
+            tarefas = {}
+            with ThreadPoolExecutor(max_workers=self.max_trabalhadores) as executor:
+                for cliente, nome_planilha in self.clientes.items():
+                    ficheiro = ficheiros.get(nome_planilha)
+                    if ficheiro is None:
+                        estado_da_carga[cliente] = f"erro: planilha '{nome_planilha}' não encontrada ou não partilhada"
+                        continue
+                    tarefas[cliente] = executor.submit(self._ler_cliente, cliente, ficheiro, forcar)
+            for cliente, tarefa in tarefas.items():
+                try:
+                    estado_da_carga[cliente] = tarefa.result()
+                except Exception as e:
+                    # Qualquer falha fica só neste cliente (ex.: planilha com dados inesperados).
+                    logger.warning("Falha ao ler a planilha do cliente '%s'.", cliente, exc_info=True)
+                    estado_da_carga[cliente] = f"erro: {type(e).__name__}: {e}"
+            self.estado_da_ultima_carga = {cliente: estado_da_carga[cliente] for cliente in self.clientes}
+            alterados = any(not descricao.startswith(("inalterada", "erro")) for descricao in estado_da_carga.values())
+            if self._consolidado is None or alterados:
+                with medir("juntar_clientes"):
+                    self._consolidado = self._juntar()
+            self.segundos_da_ultima_carga = time.perf_counter() - inicio
+            return self._consolidado
+
+    @property
+    def consolidado(self):
+        """DataFrame da última carga, ou None se ainda não houve nenhuma."""
+        return self._consolidado
+
+    def _juntar(self):
+        partes = [estado.df for cliente, estado in self._estados.items() if cliente in self.clientes and estado.df is not None]
+        if not partes:
+            return pd.DataFrame(columns=["Cliente"] + self.cabecalho)
+        df = pd.concat(partes, ignore_index=True)
+        df["Cliente"] = df["Cliente"].astype("category")
+        return df
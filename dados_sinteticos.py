@@ -0,0 +1,64 @@
+"""
+Respostas sintéticas do questionário, para o benchmark e para os testes.
+
+Os dados ficam em colunas compactas (categorias e texto Arrow), para que o patamar de
+1 milhão de respostas do benchmark caiba em memória.
+"""
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+import calculadora_copsoq_br as motor
+from armazenamento import CABECALHO
+
+ROTULOS = [rotulo for rotulo in motor.pontuacao_map if rotulo is not None]
+SETORES = ["Administrativo", "Operações", "Comercial", "TI"]
+ONDAS = ["2025-1", "2025-2"]
+
+
+def gerar_respostas_sinteticas(linhas, semente=42, proporcao_ausentes=0.02):
+    """
+    DataFrame com as 32 perguntas preenchidas com rótulos válidos do 'pontuacao_map' e alguns
+    ausentes. As colunas são categorias (1 byte por resposta), geradas uma de cada vez.
+    """
+    rng = np.random.default_rng(semente)
+    colunas = {}
+    for chave in motor.chaves_perguntas:
+        codigos = rng.integers(0, len(ROTULOS), size=linhas, dtype=np.int8)
+        codigos[rng.random(linhas) < proporcao_ausentes] = -1
+        colunas[chave] = pd.Categorical.from_codes(codigos, categories=ROTULOS)
+    return pd.DataFrame(colunas)
+
+
+def gerar_dataframe_planilha(respostas, semente=42):
+    """
+    As respostas como ficam na planilha (tudo em texto, com as pontuações e os segmentos),
+    em colunas compactas: categorias para respostas e segmentos, texto Arrow para as pontuações.
+    """
+    rng = np.random.default_rng(semente)
+    linhas = len(respostas)
+    pontuacoes = motor.calcular_dimensoes_lote(respostas)
+    df = respostas.copy()
+    df.insert(0, "Timestamp", pd.Categorical.from_codes(np.zeros(linhas, dtype=np.int8), categories=[datetime.now().strftime("%Y-%m-%d %H:%M:%S")]))
+    for dimensao in pontuacoes.columns:
+        texto = pa.array(pontuacoes[dimensao].to_numpy(), from_pandas=True).cast(pa.string())
+        df[dimensao] = pd.Series(pd.arrays.ArrowStringArray(texto), index=df.index)
+    df["Empresa"] = pd.Categorical.from_codes(np.zeros(linhas, dtype=np.int8), categories=["Empresa Sintética"])
+    df["Setor"] = pd.Categorical.from_codes(rng.integers(0, len(SETORES), size=linhas, dtype=np.int8), categories=SETORES)
+    df["Unidade"] = pd.Categorical.from_codes(np.zeros(linhas, dtype=np.int8), categories=[""])
+    df["Onda"] = pd.Categorical.from_codes(rng.integers(0, len(ONDAS), size=linhas, dtype=np.int8), categories=ONDAS)
+    return df[CABECALHO]
+
+
+def respostas_como_registros(respostas):
+    """Dicionários de respostas como os do formulário, com None nas perguntas em branco."""
+    respostas = respostas.astype(object)
+    return respostas.where(respostas.notna(), None).to_dict(orient="records")
+
+
+def linhas_da_planilha(df_planilha, inicio, fim):
+    """Linhas [inicio, fim) como listas de texto, tal como o gspread as devolve ('' nas células vazias)."""
+    bloco = df_planilha.iloc[inicio:fim].astype(object)
+    return bloco.where(bloco.notna(), "").values.tolist()
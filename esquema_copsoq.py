@@ -0,0 +1,139 @@
+"""
+Esquema versionado do questionário COPSOQ II (Versão Curta - Brasil): temas, dimensões,
+perguntas e escalas de resposta. É a única fonte desta informação; a página do questionário
+e o motor de cálculo leem daqui. As tabelas de consulta são compiladas uma vez na importação
+e ficam imutáveis (tuplos, MappingProxyType e arrays NumPy só de leitura).
+"""
+from types import MappingProxyType
+
+import numpy as np
+
+# Incrementar sempre que perguntas, dimensões ou escalas mudarem.
+VERSAO_ESQUEMA = "copsoq-ii-br-curto/1"
+
+# Escalas de resposta e respetivas pontuações (0 a 100).
+ESCALA_FREQUENCIA = ("Nunca", "Raramente", "Às vezes", "Frequentemente", "Sempre")
+ESCALA_SAUDE = ("Muito ruim", "Ruim", "Razoável", "Boa", "Muito boa")
+PONTUACOES_ESCALA = (0, 25, 50, 75, 100)
+
+# Temas -> dimensões -> (chave, texto da pergunta), conforme a versão curta validada para o Brasil.
+TEMAS = (
+    ("🧠 Exigências no Trabalho", (
+        ("Ritmo de Trabalho", (
+            ("Q1", "Você tem que trabalhar muito rápido?"),
+            ("Q2", "O seu trabalho exige que você trabalhe em um ritmo acelerado?"),
+        )),
+        ("Exigências Cognitivas", (
+            ("Q3", "O seu trabalho exige que você memorize muitas coisas?"),
+            ("Q4", "O seu trabalho exige que você tome decisões difíceis?"),
+        )),
+        ("Exigências Emocionais", (
+            ("Q5", "O seu trabalho te coloca em situações emocionalmente difíceis?"),
+            ("Q6", "Você precisa lidar com os problemas pessoais de outras pessoas no seu trabalho?"),
+        )),
+    )),
+    ("🛠️ Organização e Conteúdo do Trabalho", (
+        ("Influência", (
+            ("Q7", "Você tem influência sobre as coisas que afetam o seu trabalho?"),
+            ("Q8", "Você tem influência sobre o seu ritmo de trabalho?"),
+        )),
+        ("Possibilidades de Desenvolvimento", (
+            ("Q9", "O seu trabalho te dá a possibilidade de aprender coisas novas?"),
+            ("Q10", "O seu trabalho te dá a oportunidade de desenvolver as suas competências?"),
+        )),
+        ("Sentido do Trabalho", (
+            ("Q11", "O seu trabalho é significativo para você?"),
+            ("Q12", "Você sente que o trabalho que você faz é importante?"),
+        )),
+        ("Comprometimento com o Local de Trabalho", (
+            ("Q13", "Você gosta de falar sobre o seu trabalho com outras pessoas?"),
+            ("Q14", "Você se sente orgulhoso(a) de trabalhar nesta organização?"),
+        )),
+    )),
+    ("👥 Relações Sociais e Liderança", (
+        ("Previsibilidade", (
+            ("Q15", "Você recebe com antecedência as informações sobre decisões importantes?"),
+            ("Q16", "Você recebe todas as informações necessárias para fazer bem o seu trabalho?"),
+        )),
+        ("Clareza de Papel", (
+            ("Q17", "Você sabe exatamente o que se espera de você no trabalho?"),
+        )),
+        ("Conflito de Papel", (
+            ("Q18", "Você recebe tarefas com exigências contraditórias?"),
+        )),
+        ("Qualidade da Liderança", (
+            ("Q19", "O seu chefe imediato é bom em planejar o trabalho?"),
+            ("Q20", "O seu chefe imediato é bom em resolver conflitos?"),
+        )),
+        ("Apoio Social do Superior", (
+            ("Q21", "Você consegue ajuda e apoio do seu chefe imediato, se necessário?"),
+        )),
+        ("Apoio Social dos Colegas", (
+            ("Q22", "Você consegue ajuda e apoio dos seus colegas, se necessário?"),
+        )),
+        ("Sentido de Comunidade", (
+            ("Q23", "Existe um bom ambiente de trabalho entre você e seus colegas?"),
+        )),
+    )),
+    ("🏢 Interface Trabalho-Indivíduo e Saúde", (
+        ("Insegurança no Emprego", (
+            ("Q24", "Você está preocupado(a) em perder o seu emprego?"),
+        )),
+        ("Conflito Trabalho-Família", (
+            ("Q25", "As exigências do seu trabalho interferem na sua vida familiar e doméstica?"),
+        )),
+        ("Satisfação no Trabalho", (
+            ("Q26", "De um modo geral, o quão satisfeito(a) você está com o seu trabalho?"),
+        )),
+        ("Saúde em Geral", (
+            ("Q27", "Em geral, como você diria que é a sua saúde?"),
+        )),
+        ("Burnout", (
+            ("Q28", "Com que frequência você se sente física e emocionalmente esgotado(a)?"),
+        )),
+        ("Estresse", (
+            ("Q29", "Com que frequência você se sente tenso(a) ou estressado(a)?"),
+        )),
+        ("Problemas de Sono", (
+            ("Q30", "Com que frequência você dorme mal e acorda cansado(a)?"),
+        )),
+        ("Sintomas Depressivos", (
+            ("Q31", "Com que frequência você se sente triste ou deprimido(a)?"),
+        )),
+    )),
+    ("🚫 Comportamentos Ofensivos", (
+        ("Assédio Moral", (
+            ("Q32", "Você já foi submetido(a) a assédio moral (bullying) no seu trabalho nos últimos 12 meses?"),
+        )),
+    )),)
+
+# --- TABELAS COMPILADAS ---
+PONTUACAO_POR_ROTULO = MappingProxyType({
+    **dict(zip(ESCALA_FREQUENCIA, PONTUACOES_ESCALA)),
+    **dict(zip(ESCALA_SAUDE, PONTUACOES_ESCALA)),
+    None: None,
+})
+
+CHAVES_PERGUNTAS = tuple(chave for _, dimensoes in TEMAS for _, perguntas in dimensoes for chave, _ in perguntas)
+DIMENSOES = tuple(dimensao for _, dimensoes in TEMAS for dimensao, _ in dimensoes)
+NOMES_TEMAS = tuple(tema for tema, _ in TEMAS)
+
+TEXTO_POR_PERGUNTA = MappingProxyType({chave: texto for _, dimensoes in TEMAS for _, perguntas in dimensoes for chave, texto in perguntas})
+PERGUNTAS_POR_DIMENSAO = MappingProxyType({dimensao: tuple(chave for chave, _ in perguntas) for _, dimensoes in TEMAS for dimensao, perguntas in dimensoes})
+PERGUNTAS_POR_TEMA = MappingProxyType({tema: tuple(chave for _, perguntas in dimensoes for chave, _ in perguntas) for tema, dimensoes in TEMAS})
+
+
+def _so_leitura(array):
+    array.setflags(write=False)
+    return array
+
+
+# Índice da dimensão (em DIMENSOES) de cada pergunta (em CHAVES_PERGUNTAS).
+INDICE_DIMENSAO_POR_PERGUNTA = _so_leitura(np.array(
+    [DIMENSOES.index(dimensao) for _, dimensoes in TEMAS for dimensao, perguntas in dimensoes for _ in perguntas], dtype=np.intp
+))
+
+# Matriz (perguntas x dimensões) com 1 onde a pergunta pertence à dimensão.
+MATRIZ_DIMENSOES = np.zeros((len(CHAVES_PERGUNTAS), len(DIMENSOES)), dtype=np.float64)
+MATRIZ_DIMENSOES[np.arange(len(CHAVES_PERGUNTAS)), INDICE_DIMENSAO_POR_PERGUNTA] = 1.0
+MATRIZ_DIMENSOES = _so_leitura(MATRIZ_DIMENSOES)
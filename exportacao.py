@@ -0,0 +1,81 @@
+import gzip
+import io
+
+import pandas as pd
+
+import calculadora_copsoq_br as motor
+from armazenamento import COLUNAS_NUMERICAS, tipar_dataframe
+from cache_lru import CacheLRU
+from instrumentacao import anotar, cronometrado
+
+# Todos os rótulos de resposta conhecidos, na ordem das escalas.
+CATEGORIAS_RESPOSTA = [rotulo for rotulo in motor.pontuacao_map if rotulo is not None]
+
+_cache_exportacoes = CacheLRU(limite_bytes=64 * 1024 * 1024)
+
+
+def tipar_respostas(df):
+    """
+    Devolve uma cópia com tipos colunares: Timestamp como data, respostas e segmentos como
+    categorias (poucos valores distintos) e pontuações como float32.
+    """
+    df = tipar_dataframe(df.copy())
+    if "Timestamp" in df.columns:
+        df["Timestamp"] = pd.to_datetime(df["Timestamp"], errors="coerce")
+    for chave in motor.chaves_perguntas:
+        if chave in df.columns:
+            df[chave] = pd.Categorical(df[chave].where(df[chave] != ""), categories=CATEGORIAS_RESPOSTA)
+    for coluna in COLUNAS_NUMERICAS:
+        if coluna in df.columns:
+            df[coluna] = df[coluna].astype("float32")
+    for campo in motor.campos_segmento:
+        if campo in df.columns:
+            df[campo] = df[campo].where(df[campo] != "").astype("category")
+    return df
+
+
+def exportar_parquet(df):
+    """Parquet (requer 'pyarrow') com as colunas tipadas; as categorias ficam com codificação por dicionário."""
+    buffer = io.BytesIO()
+    tipar_respostas(df).to_parquet(buffer, index=False)
+    return buffer.getvalue()
+
+
+def exportar_csv_gzip(df):
+    """CSV em UTF-8 comprimido com gzip (mtime fixo, para que o mesmo conteúdo dê os mesmos bytes)."""
+    buffer = io.BytesIO()
+    with gzip.GzipFile(fileobj=buffer, mode="wb", compresslevel=6, mtime=0) as ficheiro:
+        ficheiro.write(df.to_csv(index=False).encode("utf-8"))
+    return buffer.getvalue()
+
+
+def exportar_csv(df):
+    return df.to_csv(index=False).encode("utf-8")
+
+
+# formato -> (função, extensão, tipo MIME)
+FORMATOS = {
+    "Parquet (.parquet)": (exportar_parquet, "parquet", "application/vnd.apache.parquet"),
+    "CSV comprimido (.csv.gz)": (exportar_csv_gzip, "csv.gz", "application/gzip"),
+    "CSV (.csv)": (exportar_csv, "csv", "text/csv"),
+}
+
+
+@cronometrado("obter_exportacao", cache="hit")
+def obter_exportacao(versao, formato, carregar_df):
+    """
+    Devolve os bytes do ficheiro no 'formato' pedido para a 'versao' dos dados, gerando-os
+    apenas se ainda não estiverem em cache. 'carregar_df' só é chamado quando é preciso gerar.
+    """
+    chave = (versao, formato)
+    dados = _cache_exportacoes.obter(chave)
+    if dados is None:
+        anotar(cache="miss", formato=formato)
+        funcao, _, _ = FORMATOS[formato]
+        dados = funcao(carregar_df())
+        _cache_exportacoes.guardar(chave, dados)
+    return dados
+
+
+def limpar_cache():
+    _cache_exportacoes.limpar()
@@ -0,0 +1,215 @@
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+
+import gspread
+import requests
+from google.auth.exceptions import TransportError
+
+logger = logging.getLogger(__name__)
+
+# Erros que costumam passar sozinhos (quota da API, falha de rede, renovação do token).
+EXCECOES_TRANSITORIAS = (gspread.exceptions.APIError, requests.exceptions.RequestException, TransportError)
+
+
+class GravadorEmLote:
+    """
+    Grava as respostas em segundo plano, agrupando-as em lotes.
+
+    'enviar' acrescenta a linha a um ficheiro de spool local (com fsync) e coloca-a numa
+    fila limitada; a partir daí a resposta está garantida e o respondente não espera pela API.
+    Uma thread esvazia a fila a cada 'intervalo' segundos e grava tudo com uma única chamada a
+    'armazenamento.salvar_lote'. Depois de qualquer falha espera antes de tentar de novo, com
+    espera exponencial até 'espera_maxima' enquanto as falhas continuarem (ex.: rede em baixo).
+    O spool é a fonte de verdade: linhas que não couberam na fila, ou que lá estejam ao reiniciar
+    a aplicação, são relidas dele pela thread e gravadas também.
+    """
+
+    def __init__(self, armazenamento, caminho_spool, intervalo=2.0, tamanho_fila=1000, tamanho_lote=500,
+                 max_tentativas=5, espera_inicial=1.0, espera_maxima=60.0, excecoes_transitorias=EXCECOES_TRANSITORIAS):
+        self.armazenamento = armazenamento
+        self.caminho_spool = caminho_spool
+        self.intervalo = intervalo
+        self.tamanho_lote = tamanho_lote
+        self.max_tentativas = max_tentativas
+        self.espera_inicial = espera_inicial
+        self.espera_maxima = espera_maxima
+        self.excecoes_transitorias = excecoes_transitorias
+        # Espera após a próxima falha; duplica a cada falha seguida e volta ao início após um sucesso.
+        self._espera = espera_inicial
+        self._fila = queue.Queue(maxsize=tamanho_fila)
+        self._lock_spool = threading.Lock()
+        self._parar = threading.Event()
+        self._reler_spool = threading.Event()
+        # Ids já gravados no armazenamento cuja remoção do spool ainda não foi concluída.
+        self._ids_por_remover = set()
+        pasta = os.path.dirname(caminho_spool)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+        self._pendentes = self._ler_spool()
+        self._thread = threading.Thread(target=self._executar, name="gravador-copsoq", daemon=True)
+        self._thread.start()
+
+    def enviar(self, linha):
+        """
+        Guarda a linha no spool e agenda a gravação. Devolve assim que a linha está no disco,
+        sem esperar pela fila: se ela estiver cheia, a thread relê a linha do spool.
+        """
+        registro = {"id": uuid.uuid4().hex, "linha": linha}
+        with self._lock_spool:
+            with open(self.caminho_spool, "a", encoding="utf-8") as ficheiro:
+                ficheiro.write(json.dumps(registro, ensure_ascii=False) + "\n")
+                ficheiro.flush()
+                os.fsync(ficheiro.fileno())
+            # Ainda dentro do lock, para que a releitura do spool nunca veja a linha antes da fila.
+            try:
+                self._fila.put_nowait(registro)
+            except queue.Full:
+                logger.warning("Fila de gravação cheia; a resposta %s será relida do spool.", registro["id"])
+                self._reler_spool.set()
+        return True
+
+    @property
+    def pendentes(self):
+        """Número aproximado de respostas ainda não gravadas."""
+        return len(self._pendentes) + self._fila.qsize()
+
+    @property
+    def ativo(self):
+        return self._thread.is_alive()
+
+    def parar(self, timeout=30.0):
+        """Pede à thread para gravar o que falta e terminar."""
+        self._parar.set()
+        self._thread.join(timeout)
+
+    def _executar(self):
+        while True:
+            try:
+                if self._ids_por_remover:
+                    self._remover_do_spool()
+                if self._reler_spool.is_set():
+                    self._reconciliar_com_spool()
+                self._recolher()
+                if self._pendentes:
+                    self._gravar_pendentes()
+            except Exception:
+                # Nenhum erro pode terminar a thread: o spool continua a ter tudo o que falta gravar.
+                logger.exception("Erro no ciclo do gravador; o estado será reconciliado com o spool.")
+                self._reler_spool.set()
+                self._parar.wait(self.intervalo)
+            if self._parar.is_set() and self._fila.empty() and not self._reler_spool.is_set():
+                if self._pendentes:
+                    logger.error("Gravador terminado com %d respostas por gravar; ficam no spool.", len(self._pendentes))
+                return
+
+    def _reconciliar_com_spool(self):
+        """Junta às pendentes as linhas do spool que esta thread ainda não conhece."""
+        with self._lock_spool:
+            self._reler_spool.clear()
+            while True:
+                try:
+                    self._pendentes.append(self._fila.get_nowait())
+                except queue.Empty:
+                    break
+            conhecidos = {registro["id"] for registro in self._pendentes} | self._ids_por_remover
+            novos = [registro for registro in self._ler_spool() if registro["id"] not in conhecidos]
+            self._pendentes.extend(novos)
+        if novos:
+            logger.info("%d respostas recuperadas do spool.", len(novos))
+
+    def _recolher(self):
+        # Espera pela primeira linha (ou pelo fim do intervalo) e junta tudo o que já estiver na fila.
+        prazo = time.monotonic() + self.intervalo
+        while len(self._pendentes) < self.tamanho_lote:
+            restante = prazo - time.monotonic()
+            if restante <= 0 or self._parar.is_set():
+                try:
+                    self._pendentes.append(self._fila.get_nowait())
+                    continue
+                except queue.Empty:
+                    return
+            try:
+                self._pendentes.append(self._fila.get(timeout=restante))
+            except queue.Empty:
+                return
+
+    def _gravar_pendentes(self):
+        lote = self._pendentes[:self.tamanho_lote]
+        for tentativa in range(1, self.max_tentativas + 1):
+            try:
+                self.armazenamento.salvar_lote([registro["linha"] for registro in lote])
+            except self.excecoes_transitorias as e:
+                logger.warning("Falha ao gravar lote de %d respostas (tentativa %d): %s", len(lote), tentativa, e)
+            except Exception:
+                # Erro não transitório: o lote fica pendente e volta a ser tentado no próximo ciclo.
+                logger.exception("Erro inesperado ao gravar lote de %d respostas.", len(lote))
+                self._esperar_apos_falha()
+                return
+            else:
+                self._espera = self.espera_inicial
+                del self._pendentes[:len(lote)]
+                self._ids_por_remover.update(registro["id"] for registro in lote)
+                self._remover_do_spool()
+                return
+            self._esperar_apos_falha()
+
+    def _esperar_apos_falha(self):
+        # Sem esta espera, com um lote cheio pendente '_recolher' não bloqueia e o ciclo repetiria sem pausa.
+        self._parar.wait(self._espera)
+        self._espera = min(self._espera * 2, self.espera_maxima)
+
+    def _ler_spool(self):
+        registros = []
+        try:
+            with open(self.caminho_spool, encoding="utf-8") as ficheiro:
+                for linha in ficheiro:
+                    try:
+                        registros.append(json.loads(linha))
+                    except json.JSONDecodeError:
+                        # Última linha truncada por uma paragem abrupta: não chegou a ser confirmada.
+                        continue
+        except FileNotFoundError:
+            pass
+        return registros
+
+    def _remover_do_spool(self):
+        with self._lock_spool:
+            restantes = [registro for registro in self._ler_spool() if registro["id"] not in self._ids_por_remover]
+            temporario = f"{self.caminho_spool}.tmp"
+            with open(temporario, "w", encoding="utf-8") as ficheiro:
+                for registro in restantes:
+                    ficheiro.write(json.dumps(registro, ensure_ascii=False) + "\n")
+                ficheiro.flush()
+                os.fsync(ficheiro.fileno())
+            os.replace(temporario, self.caminho_spool)
+            self._ids_por_remover.clear()
+
+
+_gravadores = {}
+_lock_gravadores = threading.Lock()
+
+
+def obter_gravador(caminho_spool, criar_armazenamento, **opcoes):
+    """
+    Devolve o gravador do processo para este spool, criando-o na primeira chamada ou se a
+    thread do anterior tiver parado. Fica fora das caches do Streamlit para que limpar a cache
+    não deixe duas threads a esvaziar o mesmo spool. O armazenamento é pedido a
+    'criar_armazenamento' em cada chamada: se mudar (cache limpa, outro tipo de armazenamento),
+    os próximos lotes vão para o novo, que é o que o painel lê.
+    """
+    armazenamento = criar_armazenamento()
+    with _lock_gravadores:
+        gravador = _gravadores.get(caminho_spool)
+        if gravador is None or not gravador.ativo:
+            if gravador is not None:
+                logger.error("A thread do gravador de '%s' parou; a criar um novo gravador.", caminho_spool)
+            gravador = _gravadores[caminho_spool] = GravadorEmLote(armazenamento, caminho_spool, **opcoes)
+        elif gravador.armazenamento is not armazenamento:
+            logger.info("O gravador de '%s' passa a gravar em %s.", caminho_spool, getattr(armazenamento, "origem", armazenamento))
+            gravador.armazenamento = armazenamento
+        return gravador
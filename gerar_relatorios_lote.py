@@ -0,0 +1,129 @@
+"""
+Gera o relatório PDF e o gráfico de médias para vários clientes de uma só vez, sem Streamlit.
+
+Uso:
+    python gerar_relatorios_lote.py PASTA_COM_DADOS --saida relatorios/
+    python gerar_relatorios_lote.py manifesto.csv --saida relatorios/ --processos 8
+
+Uma pasta é lida como um ficheiro por cliente (.csv, .xlsx ou .parquet; o nome do
+ficheiro é o nome do cliente). Um manifesto (.csv ou .json) lista 'cliente', 'caminho'
+e, opcionalmente, 'logo' (URL) para cada cliente.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+import calculadora_copsoq_br as motor
+from armazenamento import tipar_dataframe
+from nomes_de_ficheiro import nome_de_ficheiro
+from relatorio_pdf import ErroLogo, criar_grafico_medias, gerar_relatorio_pdf, obter_logo, tabela_de_medias
+
+EXTENSOES_DADOS = ('.csv', '.xlsx', '.parquet')
+
+
+def ler_manifesto(origem):
+    """Devolve a lista de trabalhos [{'cliente', 'caminho', 'logo'}] a partir de uma pasta ou de um manifesto."""
+    if os.path.isdir(origem):
+        return [
+            {"cliente": os.path.splitext(nome)[0], "caminho": os.path.join(origem, nome), "logo": None}
+            for nome in sorted(os.listdir(origem)) if nome.lower().endswith(EXTENSOES_DADOS)
+        ]
+    if origem.lower().endswith('.json'):
+        with open(origem, encoding='utf-8') as ficheiro:
+            entradas = json.load(ficheiro)
+    else:
+        entradas = pd.read_csv(origem, dtype=str, keep_default_na=False).to_dict(orient='records')
+    pasta_base = os.path.dirname(os.path.abspath(origem))
+    return [
+        {"cliente": entrada["cliente"], "caminho": os.path.join(pasta_base, entrada["caminho"]), "logo": entrada.get("logo") or None}
+        for entrada in entradas
+    ]
+
+
+def ler_respostas(caminho):
+    extensao = os.path.splitext(caminho)[1].lower()
+    if extensao == '.parquet':
+        return pd.read_parquet(caminho)
+    if extensao == '.xlsx':
+        return pd.read_excel(caminho, dtype=str)
+    return pd.read_csv(caminho, dtype=str, keep_default_na=False)
+
+
+def calcular_medias(df):
+    """Médias por dimensão; pontua as respostas se o ficheiro não trouxer as colunas das dimensões."""
+    dimensoes = list(motor.definicao_dimensoes.keys())
+    if all(dimensao in df.columns for dimensao in dimensoes):
+        pontuacoes = tipar_dataframe(df[dimensoes].copy())
+    else:
+        pontuacoes = pd.DataFrame(motor.calcular_medias_lote(motor.codificar_respostas(df)), columns=dimensoes)
+    return pontuacoes.mean()
+
+
+def processar_cliente(trabalho, pasta_saida, logo_png=None):
+    """Gera o PDF e o gráfico (HTML) de um cliente. Corre num processo separado."""
+    inicio = time.perf_counter()
+    df = ler_respostas(trabalho["caminho"])
+    if df.empty:
+        raise ValueError("O ficheiro não tem respostas.")
+    df_medias = tabela_de_medias(calcular_medias(df))
+    if df_medias.empty:
+        raise ValueError("Nenhuma dimensão com dados numéricos válidos.")
+    # O nome do cliente vem do manifesto: nunca é usado tal como está no caminho de saída.
+    base = os.path.join(pasta_saida, f"relatorio_copsoq_br_{nome_de_ficheiro(trabalho['cliente'])}")
+    with open(f"{base}.pdf", "wb") as ficheiro:
+        ficheiro.write(gerar_relatorio_pdf(df_medias, len(df), logo_png))
+    criar_grafico_medias(df_medias).write_html(f"{base}_grafico.html", include_plotlyjs='cdn')
+    return len(df), time.perf_counter() - inicio
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gera relatórios COPSOQ II para vários clientes em paralelo.")
+    parser.add_argument("origem", help="Pasta com um ficheiro por cliente, ou manifesto .csv/.json.")
+    parser.add_argument("--saida", default="relatorios", help="Pasta onde os relatórios são gravados.")
+    parser.add_argument("--processos", type=int, default=os.cpu_count(), help="Número de processos em paralelo.")
+    parser.add_argument("--logo", default=None, help="URL do logo usado quando o manifesto não indica outro.")
+    args = parser.parse_args(argv)
+
+    trabalhos = ler_manifesto(args.origem)
+    if not trabalhos:
+        print(f"Nenhum conjunto de dados encontrado em '{args.origem}'.", file=sys.stderr)
+        return 1
+    os.makedirs(args.saida, exist_ok=True)
+
+    # Os logos são baixados uma vez no processo principal e enviados aos processos como bytes.
+    logos = {}
+    for url in {trabalho["logo"] or args.logo for trabalho in trabalhos} - {None}:
+        try:
+            logos[url] = obter_logo(url)
+        except ErroLogo as e:
+            print(f"Aviso: {e} ({url}) Os relatórios serão gerados sem ele.", file=sys.stderr)
+
+    inicio = time.perf_counter()
+    falhas = []
+    with ProcessPoolExecutor(max_workers=args.processos) as executor:
+        futuros = {
+            executor.submit(processar_cliente, trabalho, args.saida, logos.get(trabalho["logo"] or args.logo)): trabalho
+            for trabalho in trabalhos
+        }
+        for concluidos, futuro in enumerate(as_completed(futuros), start=1):
+            cliente = futuros[futuro]["cliente"]
+            try:
+                linhas, duracao = futuro.result()
+                print(f"[{concluidos}/{len(trabalhos)}] {cliente}: {linhas} respostas em {duracao:.2f} s")
+            except Exception as e:
+                falhas.append((cliente, e))
+                print(f"[{concluidos}/{len(trabalhos)}] {cliente}: FALHOU ({e})")
+
+    print(f"\nConcluído em {time.perf_counter() - inicio:.2f} s: {len(trabalhos) - len(falhas)} relatórios gerados, {len(falhas)} falhas.")
+    for cliente, erro in falhas:
+        print(f"  - {cliente}: {type(erro).__name__}: {erro}")
+    return 1 if falhas else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,183 @@
+"""
+Importa respostas históricas ou recolhidas em papel (CSV ou XLSX) para o armazenamento,
+em blocos de tamanho fixo, sem carregar o ficheiro inteiro em memória.
+
+Uso:
+    python importador.py respostas.csv --sqlite .estado_copsoq/respostas.sqlite3
+    python importador.py respostas.xlsx --credenciais conta_servico.json --planilha "Resultados_COPSOQ_II_BR_Validado"
+
+O ficheiro precisa das colunas Q1...Q32 com os rótulos da escala (ex.: "Às vezes").
+Colunas 'Timestamp', 'Empresa', 'Setor', 'Unidade' e 'Onda' são opcionais. As linhas
+inválidas não são importadas e ficam num CSV à parte, com o número da linha e o motivo.
+"""
+import argparse
+import csv
+import math
+import sys
+from datetime import datetime
+from itertools import islice
+
+import calculadora_copsoq_br as motor
+
+TAMANHO_BLOCO = 10_000
+ROTULOS_VALIDOS = {rotulo for rotulo in motor.pontuacao_map if rotulo is not None}
+
+
+def ler_registros_csv(caminho):
+    """Gera (número da linha, cabeçalho, valores) para cada linha do CSV; aceita ',' ou ';' como separador."""
+    with open(caminho, newline='', encoding='utf-8-sig') as ficheiro:
+        amostra = ficheiro.read(64 * 1024)
+        ficheiro.seek(0)
+        try:
+            dialeto = csv.Sniffer().sniff(amostra, delimiters=',;\t')
+        except csv.Error:
+            dialeto = csv.excel
+        leitor = csv.reader(ficheiro, dialeto)
+        cabecalho = [coluna.strip() for coluna in next(leitor, [])]
+        for numero, valores in enumerate(leitor, start=2):
+            if any(valor.strip() for valor in valores):
+                yield numero, cabecalho, valores
+
+
+def ler_registros_xlsx(caminho):
+    """Gera (número da linha, cabeçalho, valores) da primeira folha, em modo só de leitura (streaming)."""
+    from openpyxl import load_workbook
+
+    livro = load_workbook(caminho, read_only=True, data_only=True)
+    try:
+        linhas = livro.worksheets[0].iter_rows(values_only=True)
+        cabecalho = [str(coluna).strip() if coluna is not None else "" for coluna in next(linhas, ())]
+        for numero, valores in enumerate(linhas, start=2):
+            valores = ["" if valor is None else str(valor) for valor in valores]
+            if any(valor.strip() for valor in valores):
+                yield numero, cabecalho, valores
+    finally:
+        livro.close()
+
+
+def validar_registro(cabecalho, valores):
+    """
+    Devolve (respostas, extras, erro). 'respostas' é a lista das 32 respostas (None quando em branco),
+    'extras' tem Timestamp e segmentos, e 'erro' descreve o primeiro problema encontrado (ou None).
+    """
+    registro = dict(zip(cabecalho, (valor.strip() for valor in valores)))
+    respostas = []
+    for chave in motor.chaves_perguntas:
+        resposta = registro.get(chave, "")
+        if resposta and resposta not in ROTULOS_VALIDOS:
+            return None, None, f"{chave}: resposta inválida '{resposta}'"
+        respostas.append(resposta or None)
+    if all(resposta is None for resposta in respostas):
+        return None, None, "linha sem respostas"
+    extras = {campo: registro.get(campo) or None for campo in ["Timestamp"] + motor.campos_segmento}
+    return respostas, extras, None
+
+
+class ImportadorEmBlocos:
+    """Valida, pontua e grava as respostas bloco a bloco."""
+
+    def __init__(self, armazenamento, caminho_rejeitadas=None, tamanho_bloco=TAMANHO_BLOCO, segmentos_padrao=None):
+        self.armazenamento = armazenamento
+        self.caminho_rejeitadas = caminho_rejeitadas
+        self.tamanho_bloco = tamanho_bloco
+        self.segmentos_padrao = segmentos_padrao or {}
+        self.lidas = 0
+        self.importadas = 0
+        self.rejeitadas = 0
+
+    def importar(self, registros, ao_progredir=None):
+        """Consome um iterável de (número, cabeçalho, valores) e devolve (lidas, importadas, rejeitadas)."""
+        registros = iter(registros)
+        ficheiro_rejeitadas = open(self.caminho_rejeitadas, 'w', newline='', encoding='utf-8') if self.caminho_rejeitadas else None
+        try:
+            escritor_rejeitadas = csv.writer(ficheiro_rejeitadas) if ficheiro_rejeitadas else None
+            verificou_cabecalho = False
+            while True:
+                bloco = list(islice(registros, self.tamanho_bloco))
+                if not bloco:
+                    break
+                if not verificou_cabecalho:
+                    em_falta = [chave for chave in motor.chaves_perguntas if chave not in bloco[0][1]]
+                    if em_falta:
+                        raise ValueError(f"Colunas em falta no ficheiro: {', '.join(em_falta)}")
+                    if escritor_rejeitadas:
+                        escritor_rejeitadas.writerow(["linha", "erro"] + bloco[0][1])
+                    verificou_cabecalho = True
+                self._processar_bloco(bloco, escritor_rejeitadas)
+                if ao_progredir:
+                    ao_progredir(self.lidas, self.importadas, self.rejeitadas)
+        finally:
+            if ficheiro_rejeitadas:
+                ficheiro_rejeitadas.close()
+        return self.lidas, self.importadas, self.rejeitadas
+
+    def _processar_bloco(self, bloco, escritor_rejeitadas):
+        matriz, extras_validos = [], []
+        for numero, cabecalho, valores in bloco:
+            respostas, extras, erro = validar_registro(cabecalho, valores)
+            if erro:
+                self.rejeitadas += 1
+                if escritor_rejeitadas:
+                    escritor_rejeitadas.writerow([numero, erro] + list(valores))
+                continue
+            matriz.append(respostas)
+            extras_validos.append(extras)
+        self.lidas += len(bloco)
+        if not matriz:
+            return
+        medias = motor.calcular_medias_lote(motor.codificar_respostas(matriz))
+        agora = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        linhas = []
+        for respostas, pontuacoes, extras in zip(matriz, medias.tolist(), extras_validos):
+            segmentos = [extras[campo] or self.segmentos_padrao.get(campo) for campo in motor.campos_segmento]
+            pontuacoes = [None if math.isnan(valor) else valor for valor in pontuacoes]
+            linhas.append([extras["Timestamp"] or agora] + respostas + pontuacoes + segmentos)
+        self.armazenamento.salvar_lote(linhas)
+        self.importadas += len(linhas)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Importa respostas COPSOQ II de ficheiros CSV ou XLSX.")
+    parser.add_argument("ficheiro", help="Ficheiro .csv ou .xlsx com as colunas Q1...Q32.")
+    parser.add_argument("--sqlite", help="Base SQLite de destino.")
+    parser.add_argument("--credenciais", help="JSON da conta de serviço Google (para gravar numa planilha).")
+    parser.add_argument("--planilha", default="Resultados_COPSOQ_II_BR_Validado", help="Nome da planilha de destino.")
+    parser.add_argument("--rejeitadas", help="CSV onde gravar as linhas rejeitadas (por omissão: <ficheiro>.rejeitadas.csv).")
+    parser.add_argument("--bloco", type=int, default=TAMANHO_BLOCO, help="Linhas por bloco.")
+    for campo in motor.campos_segmento:
+        parser.add_argument(f"--{campo.lower()}", help=f"{campo} aplicado às linhas que não o indiquem.")
+    args = parser.parse_args(argv)
+
+    if args.sqlite:
+        from armazenamento import ArmazenamentoSQLite
+        armazenamento = ArmazenamentoSQLite(args.sqlite)
+    elif args.credenciais:
+        import gspread
+        from armazenamento import ArmazenamentoGoogleSheets
+        armazenamento = ArmazenamentoGoogleSheets(gspread.service_account(filename=args.credenciais), args.planilha)
+    else:
+        parser.error("Indique o destino com --sqlite ou --credenciais.")
+
+    if args.ficheiro.lower().endswith('.xlsx'):
+        registros = ler_registros_xlsx(args.ficheiro)
+    else:
+        registros = ler_registros_csv(args.ficheiro)
+    segmentos_padrao = {campo: getattr(args, campo.lower()) for campo in motor.campos_segmento if getattr(args, campo.lower())}
+    importador = ImportadorEmBlocos(armazenamento, args.rejeitadas or f"{args.ficheiro}.rejeitadas.csv", args.bloco, segmentos_padrao)
+
+    def mostrar_progresso(lidas, importadas, rejeitadas):
+        print(f"\r{lidas} linhas lidas, {importadas} importadas, {rejeitadas} rejeitadas", end="", flush=True)
+
+    try:
+        lidas, importadas, rejeitadas = importador.importar(registros, mostrar_progresso)
+    except ValueError as e:
+        print(f"Erro: {e}", file=sys.stderr)
+        return 1
+    print()
+    if rejeitadas:
+        print(f"As linhas rejeitadas estão em '{importador.caminho_rejeitadas}'.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,182 @@
+"""
+Medição leve das etapas lentas da aplicação (ligação à planilha, leituras, montagem do
+DataFrame, gráfico, PDF, logo).
+
+Desligada por omissão. Liga-se com a variável de ambiente COPSOQ_INSTRUMENTACAO=1 ou com
+'ativar()'. Com COPSOQ_INSTRUMENTACAO_FICHEIRO=<caminho>, cada medição é também acrescentada
+a esse ficheiro em JSON lines, para análise posterior. Desligada, cada chamada medida custa
+apenas a verificação de uma variável global.
+
+Uso:
+    with medir("carregar_planilha") as medicao:
+        linhas = worksheet.get_all_values()
+        medicao.anotar(linhas=len(linhas))
+
+    @cronometrado("gerar_relatorio_pdf")
+    def gerar_relatorio_pdf(...): ...
+
+Dentro de uma etapa, 'anotar(cache="miss")' acrescenta atributos à medição em curso, o que
+permite marcar as falhas de cache dentro de funções decoradas com 'st.cache_data'.
+"""
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+MAXIMO_MEDICOES = 5000
+
+_ativa = os.environ.get("COPSOQ_INSTRUMENTACAO", "").lower() in ("1", "true", "sim")
+_caminho_jsonl = os.environ.get("COPSOQ_INSTRUMENTACAO_FICHEIRO") or None
+_medicoes = deque(maxlen=MAXIMO_MEDICOES)
+_lock = threading.Lock()
+_local = threading.local()
+
+
+class Medicao:
+    """Uma etapa medida: nome, início, duração e atributos livres (linhas, cache, ...)."""
+
+    __slots__ = ("etapa", "inicio", "duracao_ms", "atributos", "erro", "_relogio")
+
+    def __init__(self, etapa, atributos):
+        self.etapa = etapa
+        self.atributos = atributos
+        self.inicio = time.time()
+        self.duracao_ms = None
+        self.erro = None
+        self._relogio = time.perf_counter()
+
+    def anotar(self, **atributos):
+        self.atributos.update(atributos)
+
+    def __enter__(self):
+        pilha = getattr(_local, "pilha", None)
+        if pilha is None:
+            pilha = _local.pilha = []
+        pilha.append(self)
+        return self
+
+    def __exit__(self, tipo, valor, rastreio):
+        self.duracao_ms = (time.perf_counter() - self._relogio) * 1000
+        if tipo is not None:
+            self.erro = tipo.__name__
+        _local.pilha.pop()
+        _registar(self)
+        return False
+
+    def para_dict(self):
+        return {"etapa": self.etapa, "inicio": self.inicio, "duracao_ms": round(self.duracao_ms, 3), "erro": self.erro, **self.atributos}
+
+
+class _MedicaoNula:
+    """Devolvida quando a instrumentação está desligada: não mede nem guarda nada."""
+
+    __slots__ = ()
+
+    def anotar(self, **atributos):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, valor, rastreio):
+        return False
+
+
+_MEDICAO_NULA = _MedicaoNula()
+
+
+def _registar(medicao):
+    with _lock:
+        _medicoes.append(medicao)
+        if _caminho_jsonl:
+            with open(_caminho_jsonl, "a", encoding="utf-8") as ficheiro:
+                ficheiro.write(json.dumps(medicao.para_dict(), ensure_ascii=False, default=str) + "\n")
+
+
+def ativa():
+    return _ativa
+
+
+def ativar(caminho_jsonl=None):
+    """Liga a instrumentação neste processo (e, opcionalmente, a gravação em JSON lines)."""
+    global _ativa, _caminho_jsonl
+    _ativa = True
+    if caminho_jsonl:
+        _caminho_jsonl = caminho_jsonl
+
+
+def desativar():
+    global _ativa
+    _ativa = False
+
+
+def medir(etapa, **atributos):
+    """Gestor de contexto que mede a duração da etapa; devolve um objeto com 'anotar(**atributos)'."""
+    if not _ativa:
+        return _MEDICAO_NULA
+    return Medicao(etapa, atributos)
+
+
+def anotar(**atributos):
+    """Acrescenta atributos à medição em curso nesta thread (sem efeito se não houver nenhuma)."""
+    if _ativa:
+        pilha = getattr(_local, "pilha", None)
+        if pilha:
+            pilha[-1].anotar(**atributos)
+
+
+def cronometrado(etapa=None, **atributos):
+    """Decorador equivalente a envolver o corpo da função em 'medir(etapa, **atributos)'."""
+    def decorador(funcao):
+        nome = etapa or funcao.__qualname__
+
+        @functools.wraps(funcao)
+        def envolvida(*args, **kwargs):
+            if not _ativa:
+                return funcao(*args, **kwargs)
+            with Medicao(nome, dict(atributos)):
+                return funcao(*args, **kwargs)
+        return envolvida
+    return decorador
+
+
+def medicoes():
+    """Cópia das medições guardadas (as mais antigas são descartadas acima de MAXIMO_MEDICOES)."""
+    with _lock:
+        return list(_medicoes)
+
+
+def limpar():
+    with _lock:
+        _medicoes.clear()
+
+
+def resumo():
+    """Tabela por etapa: número de medições, p50, p95 e máximo (ms), erros e falhas/acertos de cache."""
+    linhas = [medicao.para_dict() for medicao in medicoes()]
+    if not linhas:
+        return pd.DataFrame(columns=["n", "p50 (ms)", "p95 (ms)", "máx (ms)", "erros", "cache hit", "cache miss"])
+    df = pd.DataFrame(linhas)
+    if "cache" not in df.columns:
+        df["cache"] = None
+    grupos = df.groupby("etapa", sort=False)
+    tabela = pd.DataFrame({
+        "n": grupos.size(),
+        "p50 (ms)": grupos["duracao_ms"].agg(lambda d: np.percentile(d, 50)),
+        "p95 (ms)": grupos["duracao_ms"].agg(lambda d: np.percentile(d, 95)),
+        "máx (ms)": grupos["duracao_ms"].max(),
+        "erros": grupos["erro"].count(),
+        "cache hit": grupos["cache"].agg(lambda c: (c == "hit").sum()),
+        "cache miss": grupos["cache"].agg(lambda c: (c == "miss").sum()),
+    })
+    return tabela.sort_values("p95 (ms)", ascending=False)
+
+
+def para_jsonl():
+    """Medições guardadas em JSON lines (bytes), para descarregar."""
+    return "".join(json.dumps(medicao.para_dict(), ensure_ascii=False, default=str) + "\n" for medicao in medicoes()).encode("utf-8")
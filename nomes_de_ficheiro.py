@@ -0,0 +1,19 @@
+"""Nomes de ficheiro seguros a partir de textos livres (empresas, ondas, clientes)."""
+import hashlib
+import json
+import re
+
+
+def _nome_seguro(texto):
+    return re.sub(r'[^\w.-]+', '_', texto).strip('_') or '_'
+
+
+def nome_de_ficheiro(*partes):
+    """
+    Nome de ficheiro para a chave 'partes': uma parte legível só com letras, dígitos, '.', '-'
+    e '_', seguida de um resumo da chave exata, para que chaves diferentes que se escrevem
+    da mesma forma ('ACME S/A' e 'ACME S A') não partilhem o ficheiro.
+    """
+    legivel = "__".join(_nome_seguro(parte) for parte in partes)[:80]
+    resumo = hashlib.sha256(json.dumps(partes, ensure_ascii=False).encode("utf-8")).hexdigest()[:16]
+    return f"{legivel}-{resumo}"
@@ -0,0 +1,324 @@
+"""
+Instantâneos imutáveis dos agregados de cada onda (aplicação do questionário numa empresa)
+e comparação entre ondas.
+
+Cada instantâneo guarda, por dimensão, a contagem, a soma, a soma dos quadrados e o
+histograma das faixas do semáforo. As diferenças entre ondas e os testes de significância
+(t de Welch para as médias, qui-quadrado para as faixas) são calculados só a partir
+destes números, sem reler as respostas individuais.
+"""
+import json
+import math
+import os
+import re
+import threading
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import calculadora_copsoq_br as motor
+from agregados_incrementais import TAMANHO_MINIMO_GRUPO
+from analise_estatistica import FAIXAS_SEMAFORO
+from nomes_de_ficheiro import nome_de_ficheiro
+
+NIVEL_SIGNIFICANCIA = 0.05
+
+_MAX_ITERACOES = 200
+_EPSILON = 1e-12
+_MINIMO = 1e-300
+_lgamma = np.frompyfunc(math.lgamma, 1, 1)
+_erfc = np.frompyfunc(math.erfc, 1, 1)
+
+
+def _so_leitura(valores, dtype):
+    array = np.array(valores, dtype=dtype)
+    array.flags.writeable = False
+    return array
+
+
+class InstantaneoOnda:
+    """Agregados de uma onda, por dimensão. Não pode ser alterado depois de criado."""
+
+    __slots__ = ("empresa", "onda", "criado_em", "total_respostas", "dimensoes", "n", "soma", "soma_quadrados", "faixas")
+
+    def __init__(self, empresa, onda, total_respostas, dimensoes, n, soma, soma_quadrados, faixas, criado_em=None):
+        valores = {
+            "empresa": empresa,
+            "onda": onda,
+            "criado_em": criado_em or datetime.now().isoformat(timespec="seconds"),
+            "total_respostas": int(total_respostas),
+            "dimensoes": tuple(dimensoes),
+            "n": _so_leitura(n, np.int64),
+            "soma": _so_leitura(soma, np.float64),
+            "soma_quadrados": _so_leitura(soma_quadrados, np.float64),
+            "faixas": _so_leitura(faixas, np.int64).reshape(len(dimensoes), len(FAIXAS_SEMAFORO)),
+        }
+        for nome, valor in valores.items():
+            object.__setattr__(self, nome, valor)
+
+    def __setattr__(self, nome, valor):
+        raise AttributeError("Os instantâneos de onda são imutáveis.")
+
+    @property
+    def media(self):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return self.soma / self.n
+
+    @property
+    def variancia(self):
+        """Variância amostral por dimensão (NaN com menos de duas respostas)."""
+        with np.errstate(invalid='ignore', divide='ignore'):
+            variancia = (self.soma_quadrados - self.soma * self.soma / self.n) / (self.n - 1)
+        return np.where(self.n > 1, np.maximum(variancia, 0.0), np.nan)
+
+    def para_dict(self):
+        return {
+            "empresa": self.empresa,
+            "onda": self.onda,
+            "criado_em": self.criado_em,
+            "total_respostas": self.total_respostas,
+            "dimensoes": {
+                dimensao: {"n": int(n), "soma": float(soma), "soma_quadrados": float(quadrados), "faixas": faixas.tolist()}
+                for dimensao, n, soma, quadrados, faixas in zip(self.dimensoes, self.n, self.soma, self.soma_quadrados, self.faixas)
+            },
+        }
+
+    @classmethod
+    def de_dict(cls, dados):
+        dimensoes = dados["dimensoes"]
+        return cls(
+            dados["empresa"], dados["onda"], dados["total_respostas"], list(dimensoes),
+            [d["n"] for d in dimensoes.values()], [d["soma"] for d in dimensoes.values()],
+            [d["soma_quadrados"] for d in dimensoes.values()], [d["faixas"] for d in dimensoes.values()],
+            criado_em=dados["criado_em"],
+        )
+
+
+def criar_instantaneo(segmentos, empresa, onda, tamanho_minimo=TAMANHO_MINIMO_GRUPO):
+    """
+    Cria o instantâneo da 'onda' a partir do índice de segmentos do agregador incremental.
+    'empresa' vazia junta todas as empresas. Recusa grupos com menos de 'tamanho_minimo' respostas.
+    Só conta o próprio grupo (sem a supressão complementar do painel), para que outra onda ou
+    outra empresa com poucas respostas não impeça o registo de uma onda fechada.
+    """
+    filtros = {"Onda": onda}
+    if empresa:
+        filtros["Empresa"] = empresa
+    total, estatisticas = segmentos.consultar(filtros, tamanho_minimo, complementar=False)
+    if not estatisticas:
+        raise ValueError(f"A onda '{onda}' não atinge o tamanho mínimo de {tamanho_minimo} respostas exigido para preservar o anonimato.")
+    dimensoes = list(motor.definicao_dimensoes)
+    por_dimensao = [estatisticas.get(dimensao) for dimensao in dimensoes]
+    return InstantaneoOnda(
+        empresa, onda, total, dimensoes,
+        [e.n if e else 0 for e in por_dimensao],
+        [e.soma if e else 0.0 for e in por_dimensao],
+        [e.soma_quadrados if e else 0.0 for e in por_dimensao],
+        [e.faixas if e else [0] * len(FAIXAS_SEMAFORO) for e in por_dimensao],
+    )
+
+
+def _ordem_natural(texto):
+    """Chave de ordenação que compara os números pelo valor: '2025-2' vem antes de '2025-10'."""
+    return tuple((0, int(parte), "") if parte.isdigit() else (1, 0, parte.casefold()) for parte in re.split(r'(\d+)', texto) if parte)
+
+
+def ordem_das_ondas(instantaneo):
+    """Chave de ordenação dos instantâneos: por empresa e, dentro dela, pela ordem natural das ondas."""
+    return instantaneo.empresa, _ordem_natural(instantaneo.onda)
+
+
+class RepositorioOndas:
+    """
+    Pasta com um ficheiro JSON por instantâneo; o nome do ficheiro vem de 'nome_de_ficheiro'
+    e a empresa e a onda exatas ficam no próprio JSON. Um instantâneo gravado nunca é
+    substituído; os ficheiros lidos ficam em memória.
+    """
+
+    def __init__(self, pasta):
+        self.pasta = pasta
+        self._instantaneos = {}
+        self._lock = threading.Lock()
+
+    def _caminho(self, empresa, onda):
+        return os.path.join(self.pasta, f"{nome_de_ficheiro(empresa, onda)}.json")
+
+    def guardar(self, instantaneo):
+        """Grava o instantâneo; lança FileExistsError se essa onda já tiver sido registada."""
+        os.makedirs(self.pasta, exist_ok=True)
+        caminho = self._caminho(instantaneo.empresa, instantaneo.onda)
+        # Os ficheiros gravados com outro esquema de nomes também contam como já registados.
+        if any(i.onda == instantaneo.onda for i in self.listar(instantaneo.empresa)):
+            raise FileExistsError(f"Já existe um instantâneo da onda '{instantaneo.onda}' para '{instantaneo.empresa or 'todas as empresas'}'.")
+        temporario = f"{caminho}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporario, "w", encoding="utf-8") as ficheiro:
+            json.dump(instantaneo.para_dict(), ficheiro, ensure_ascii=False)
+        try:
+            # os.link falha se o destino existir: a gravação é atómica e nunca substitui outra.
+            os.link(temporario, caminho)
+        except FileExistsError:
+            raise FileExistsError(f"Já existe um instantâneo da onda '{instantaneo.onda}' para '{instantaneo.empresa or 'todas as empresas'}'.") from None
+        finally:
+            os.remove(temporario)
+        with self._lock:
+            self._instantaneos[os.path.basename(caminho)] = instantaneo
+        return caminho
+
+    def listar(self, empresa=None):
+        """Instantâneos gravados (de uma empresa, se indicada), ordenados por empresa e onda ('ordem_das_ondas')."""
+        try:
+            nomes = {entrada.name for entrada in os.scandir(self.pasta) if entrada.name.endswith(".json")}
+        except FileNotFoundError:
+            nomes = set()
+        with self._lock:
+            for nome in set(self._instantaneos) - nomes:
+                del self._instantaneos[nome]
+            for nome in nomes - set(self._instantaneos):
+                with open(os.path.join(self.pasta, nome), encoding="utf-8") as ficheiro:
+                    self._instantaneos[nome] = InstantaneoOnda.de_dict(json.load(ficheiro))
+            instantaneos = list(self._instantaneos.values())
+        if empresa is not None:
+            instantaneos = [i for i in instantaneos if i.empresa == empresa]
+        return sorted(instantaneos, key=ordem_das_ondas)
+
+    def empresas(self):
+        return sorted({instantaneo.empresa for instantaneo in self.listar()})
+
+
+def _fracao_continua_beta(a, b, x):
+    """Fração contínua da função beta incompleta (método de Lentz), vetorizada."""
+    qab, qap, qam = a + b, a + 1.0, a - 1.0
+    c = np.ones_like(x)
+    d = 1.0 - qab * x / qap
+    d = 1.0 / np.where(np.abs(d) < _MINIMO, _MINIMO, d)
+    h = d.copy()
+    for m in range(1, _MAX_ITERACOES + 1):
+        m2 = 2 * m
+        for aa in (m * (b - m) * x / ((qam + m2) * (a + m2)), -(a + m) * (qab + m) * x / ((a + m2) * (qap + m2))):
+            d = 1.0 + aa * d
+            d = 1.0 / np.where(np.abs(d) < _MINIMO, _MINIMO, d)
+            c = 1.0 + aa / c
+            c = np.where(np.abs(c) < _MINIMO, _MINIMO, c)
+            delta = d * c
+            h = h * delta
+        if np.all(np.abs(delta - 1.0) < _EPSILON):
+            break
+    return h
+
+
+def _beta_incompleta_regularizada(a, b, x):
+    """I_x(a, b) para arrays, com NaN onde algum argumento é NaN."""
+    a, b, x = np.broadcast_arrays(*(np.asarray(v, dtype=np.float64) for v in (a, b, x)))
+    validos = ~(np.isnan(a) | np.isnan(b) | np.isnan(x))
+    x = np.clip(np.where(validos, x, 0.5), 0.0, 1.0)
+    a, b = np.where(validos, a, 1.0), np.where(validos, b, 1.0)
+    trocar = x > (a + 1.0) / (a + b + 2.0)
+    a, b, x = np.where(trocar, b, a), np.where(trocar, a, b), np.where(trocar, 1.0 - x, x)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ln_frente = np.asarray(_lgamma(a + b) - _lgamma(a) - _lgamma(b), dtype=np.float64) + a * np.log(x) + b * np.log1p(-x)
+        valor = np.exp(ln_frente) * _fracao_continua_beta(a, b, x) / a
+    valor = np.where(x == 0.0, 0.0, valor)
+    return np.where(validos, np.where(trocar, 1.0 - valor, valor), np.nan)
+
+
+def teste_welch(n1, soma1, quadrados1, n2, soma2, quadrados2):
+    """
+    Teste t de Welch (bilateral) a partir de contagens, somas e somas dos quadrados.
+    Devolve (diferença das médias, estatística t, graus de liberdade, valor-p), em arrays.
+    """
+    n1, n2 = np.asarray(n1, dtype=np.float64), np.asarray(n2, dtype=np.float64)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        media1, media2 = soma1 / n1, soma2 / n2
+        erro1 = np.maximum(quadrados1 - soma1 * media1, 0.0) / (n1 - 1) / n1
+        erro2 = np.maximum(quadrados2 - soma2 * media2, 0.0) / (n2 - 1) / n2
+        erro1, erro2 = np.where(n1 > 1, erro1, np.nan), np.where(n2 > 1, erro2, np.nan)
+        erro = erro1 + erro2
+        diferenca = media2 - media1
+        t = diferenca / np.sqrt(erro)
+        graus = erro * erro / (erro1 * erro1 / (n1 - 1) + erro2 * erro2 / (n2 - 1))
+        p = _beta_incompleta_regularizada(graus / 2.0, 0.5, graus / (graus + t * t))
+    # Sem variância em nenhuma das ondas: médias iguais não diferem, médias diferentes sim.
+    sem_variancia = erro == 0
+    t = np.where(sem_variancia, np.where(diferenca == 0, 0.0, np.copysign(np.inf, diferenca)), t)
+    p = np.where(sem_variancia, np.where(diferenca == 0, 1.0, 0.0), p)
+    return diferenca, t, graus, p
+
+
+def teste_faixas(faixas1, faixas2):
+    """
+    Qui-quadrado de homogeneidade das faixas do semáforo entre duas ondas (tabela 2 x faixas),
+    vetorizado na última dimensão. Devolve (estatística, valor-p); as faixas vazias nas duas
+    ondas não contam para os graus de liberdade.
+    """
+    observados = np.stack([np.asarray(faixas1, dtype=np.float64), np.asarray(faixas2, dtype=np.float64)], axis=-2)
+    por_faixa = observados.sum(axis=-2, keepdims=True)
+    por_onda = observados.sum(axis=-1, keepdims=True)
+    total = por_onda.sum(axis=-2, keepdims=True)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        esperados = por_onda * por_faixa / total
+        parcelas = np.where(esperados > 0, (observados - esperados) ** 2 / esperados, 0.0)
+    estatistica = parcelas.sum(axis=(-2, -1))
+    graus = (por_faixa[..., 0, :] > 0).sum(axis=-1) - 1
+    ondas_vazias = (por_onda[..., 0] == 0).any(axis=-1)
+    # Com 2 graus de liberdade a cauda do qui-quadrado é exp(-x/2); com 1, erfc(sqrt(x/2)).
+    p = np.where(graus == 2, np.exp(-estatistica / 2.0), np.nan)
+    p = np.where(graus == 1, np.asarray(_erfc(np.sqrt(estatistica / 2.0)), dtype=np.float64), p)
+    p = np.where(graus == 0, 1.0, p)
+    return estatistica, np.where(ondas_vazias, np.nan, p)
+
+
+def comparar_ondas(anterior, atual, nivel_significancia=NIVEL_SIGNIFICANCIA):
+    """Tabela por dimensão com as médias das duas ondas, a diferença e os valores-p."""
+    posicoes = {dimensao: i for i, dimensao in enumerate(anterior.dimensoes)}
+    comuns = [dimensao for dimensao in atual.dimensoes if dimensao in posicoes]
+    i1 = [posicoes[dimensao] for dimensao in comuns]
+    i2 = [atual.dimensoes.index(dimensao) for dimensao in comuns]
+    diferenca, _, _, p_medias = teste_welch(
+        anterior.n[i1], anterior.soma[i1], anterior.soma_quadrados[i1],
+        atual.n[i2], atual.soma[i2], atual.soma_quadrados[i2],
+    )
+    _, p_faixas = teste_faixas(anterior.faixas[i1], atual.faixas[i2])
+    return pd.DataFrame({
+        f'Média {anterior.onda}': anterior.media[i1],
+        f'Média {atual.onda}': atual.media[i2],
+        'Diferença': diferenca,
+        'p (médias)': p_medias,
+        'p (faixas)': p_faixas,
+        'Significativa': p_medias < nivel_significancia,
+    }, index=pd.Index(comuns, name='Dimensão'))
+
+
+def evolucao_das_medias(instantaneos):
+    """Médias por dimensão (linhas) em cada onda (colunas), pela ordem recebida."""
+    return pd.DataFrame({i.onda: pd.Series(i.media, index=i.dimensoes) for i in instantaneos})
+
+
+def diferencas_consecutivas(instantaneos, nivel_significancia=NIVEL_SIGNIFICANCIA):
+    """
+    Compara cada onda com a onda anterior da mesma empresa, para todas as empresas e
+    dimensões de uma só vez. Os instantâneos têm de ter as mesmas dimensões (o mesmo esquema
+    do questionário). Devolve uma tabela longa: empresa, ondas, dimensão, diferença e valores-p.
+    """
+    instantaneos = sorted(instantaneos, key=ordem_das_ondas)
+    pares = [(a, b) for a, b in zip(instantaneos, instantaneos[1:]) if a.empresa == b.empresa]
+    if not pares:
+        return pd.DataFrame(columns=['Empresa', 'Onda anterior', 'Onda', 'Dimensão', 'Diferença', 'p (médias)', 'p (faixas)', 'Significativa'])
+    dimensoes = instantaneos[0].dimensoes
+    if any(i.dimensoes != dimensoes for i in instantaneos):
+        raise ValueError("Os instantâneos a comparar têm dimensões diferentes.")
+    anteriores, atuais = zip(*pares)
+    n1, soma1, quadrados1, faixas1 = (np.stack([getattr(i, campo) for i in anteriores]) for campo in ("n", "soma", "soma_quadrados", "faixas"))
+    n2, soma2, quadrados2, faixas2 = (np.stack([getattr(i, campo) for i in atuais]) for campo in ("n", "soma", "soma_quadrados", "faixas"))
+    diferenca, _, _, p_medias = teste_welch(n1, soma1, quadrados1, n2, soma2, quadrados2)
+    _, p_faixas = teste_faixas(faixas1, faixas2)
+    return pd.DataFrame({
+        'Empresa': np.repeat([i.empresa for i in atuais], len(dimensoes)),
+        'Onda anterior': np.repeat([i.onda for i in anteriores], len(dimensoes)),
+        'Onda': np.repeat([i.onda for i in atuais], len(dimensoes)),
+        'Dimensão': np.tile(dimensoes, len(pares)),
+        'Diferença': diferenca.ravel(),
+        'p (médias)': p_medias.ravel(),
+        'p (faixas)': p_faixas.ravel(),
+        'Significativa': (p_medias < nivel_significancia).ravel(),
+    })
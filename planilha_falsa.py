@@ -0,0 +1,147 @@
+"""
+Substitutos em memória do cliente gspread, para testes de carga e benchmarks sem acesso à rede.
+Implementam apenas os métodos usados por esta aplicação.
+"""
+import re
+import threading
+import time
+from datetime import datetime, timezone
+
+import gspread
+
+
+def _coluna_para_indice(letras):
+    indice = 0
+    for letra in letras:
+        indice = indice * 26 + (ord(letra) - ord('A') + 1)
+    return indice
+
+
+class WorksheetFalsa:
+    """Folha de cálculo em memória com a mesma interface (reduzida) de gspread.Worksheet."""
+
+    def __init__(self, titulo="Sheet1", latencia=0.0, ao_alterar=None):
+        self.title = titulo
+        self.latencia = latencia
+        self.linhas = []
+        self.chamadas = {}
+        self._ao_alterar = ao_alterar
+        self._lock = threading.Lock()
+
+    def _registar(self, metodo):
+        self.chamadas[metodo] = self.chamadas.get(metodo, 0) + 1
+        if self.latencia:
+            time.sleep(self.latencia)
+
+    def _alterado(self):
+        if self._ao_alterar:
+            self._ao_alterar()
+
+    def row_values(self, row):
+        self._registar("row_values")
+        with self._lock:
+            return list(self.linhas[row - 1]) if row <= len(self.linhas) else []
+
+    def update(self, range_name=None, values=None):
+        self._registar("update")
+        if range_name != 'A1':
+            raise NotImplementedError("WorksheetFalsa só suporta update em 'A1'.")
+        with self._lock:
+            if self.linhas:
+                self.linhas[0] = list(values[0])
+            else:
+                self.linhas.append(list(values[0]))
+        self._alterado()
+        return {"updatedRange": "A1"}
+
+    def append_row(self, values, **kwargs):
+        return self.append_rows([values], **kwargs)
+
+    def append_rows(self, values, **kwargs):
+        self._registar("append_rows")
+        with self._lock:
+            inicio = len(self.linhas) + 1
+            self.linhas.extend([str(v) for v in linha] for linha in values)
+        self._alterado()
+        return {"updates": {"updatedRange": f"A{inicio}", "updatedRows": len(values)}}
+
+    def get(self, range_name):
+        """Suporta intervalos 'A<linha>:<coluna>' e 'A<linha>:<coluna><linha>', como a aplicação usa."""
+        self._registar("get")
+        correspondencia = re.fullmatch(r"A(\d+):([A-Z]+)(\d*)", range_name)
+        if not correspondencia:
+            raise NotImplementedError(f"Intervalo não suportado: {range_name}")
+        primeira = int(correspondencia.group(1))
+        largura = _coluna_para_indice(correspondencia.group(2))
+        ultima = int(correspondencia.group(3)) if correspondencia.group(3) else None
+        with self._lock:
+            linhas = self.linhas[primeira - 1:ultima]
+        return [list(linha[:largura]) for linha in linhas]
+
+    def get_all_values(self):
+        self._registar("get_all_values")
+        with self._lock:
+            largura = max((len(linha) for linha in self.linhas), default=0)
+            return [list(linha) + [""] * (largura - len(linha)) for linha in self.linhas]
+
+
+class PlanilhaFalsa:
+    """Planilha com uma única folha ('sheet1')."""
+
+    def __init__(self, titulo, latencia=0.0):
+        self.title = titulo
+        self.id = f"falsa-{abs(hash(titulo))}"
+        self.criada_em = self.modificada_em = datetime.now(timezone.utc)
+        self.sheet1 = WorksheetFalsa(latencia=latencia, ao_alterar=self._marcar_alteracao)
+
+    def _marcar_alteracao(self):
+        self.modificada_em = datetime.now(timezone.utc)
+
+
+class ClienteFalso:
+    """Substitui o cliente devolvido por 'gspread.service_account_from_dict'."""
+
+    def __init__(self, latencia=0.0, criar_ao_abrir=True):
+        self.latencia = latencia
+        self.criar_ao_abrir = criar_ao_abrir
+        self.planilhas = {}
+        self._lock = threading.Lock()
+
+    def criar(self, titulo):
+        with self._lock:
+            if titulo not in self.planilhas:
+                self.planilhas[titulo] = PlanilhaFalsa(titulo, self.latencia)
+            return self.planilhas[titulo]
+
+    def open(self, title):
+        if self.latencia:
+            time.sleep(self.latencia)
+        if title not in self.planilhas:
+            if not self.criar_ao_abrir:
+                raise gspread.exceptions.SpreadsheetNotFound(title)
+            return self.criar(title)
+        return self.planilhas[title]
+
+    def open_by_key(self, key):
+        if self.latencia:
+            time.sleep(self.latencia)
+        for planilha in list(self.planilhas.values()):
+            if planilha.id == key:
+                return planilha
+        raise gspread.exceptions.SpreadsheetNotFound(key)
+
+    def list_spreadsheet_files(self, title=None, folder_id=None):
+        """Como no gspread: dicionários com id, name, createdTime e modifiedTime (RFC 3339, UTC)."""
+        if self.latencia:
+            time.sleep(self.latencia)
+        with self._lock:
+            planilhas = list(self.planilhas.values())
+        return [
+            {
+                "id": planilha.id,
+                "name": planilha.title,
+                "createdTime": planilha.criada_em.strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z",
+                "modifiedTime": planilha.modificada_em.strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z",
+            }
+            for planilha in planilhas if title is None or planilha.title == title
+        ]
@@ -0,0 +1,185 @@
+import hashlib
+import io
+
+import plotly.express as px
+import requests
+from fpdf import FPDF
+from PIL import Image
+
+from cache_lru import CacheLRU
+from instrumentacao import anotar, cronometrado
+
+# Formatos de logo aceites na origem; o logo é sempre regravado como PNG pequeno.
+FORMATOS_LOGO_ACEITES = ['JPEG', 'PNG', 'GIF']
+ALTURA_MAXIMA_LOGO_PX = 120
+LARGURA_MAXIMA_LOGO_PX = 600
+
+
+class ErroLogo(Exception):
+    """O logo não pôde ser baixado ou não é uma imagem válida."""
+
+
+_cache_logos = CacheLRU(limite_bytes=2 * 1024 * 1024)
+_cache_relatorios = CacheLRU(limite_bytes=16 * 1024 * 1024)
+# URLs que já falharam, para não repetir um download de 10 s a cada rerun. A falha expira
+# ao fim de VALIDADE_FALHA_LOGO segundos, para que um servidor em baixo ou um URL corrigido
+# na origem volte a ser tentado sem reiniciar a aplicação.
+VALIDADE_FALHA_LOGO = 60
+_falhas_logo = CacheLRU(limite_bytes=64 * 1024, validade=VALIDADE_FALHA_LOGO)
+
+
+@cronometrado("baixar_logo")
+def baixar_logo(url):
+    """Baixa o logo e devolve-o regravado como PNG reduzido. Levanta ErroLogo em caso de falha."""
+    try:
+        headers = {'User-Agent': 'Mozilla/5.0'}
+        response = requests.get(url, headers=headers, timeout=10)
+        response.raise_for_status()
+        img = Image.open(io.BytesIO(response.content))
+        img_format = (img.format or '').upper()
+        if img_format not in FORMATOS_LOGO_ACEITES:
+            raise ErroLogo(f"Formato de imagem '{img_format}' não suportado. Use JPG, PNG ou GIF.")
+        img.seek(0)
+        img = img.convert('RGBA' if 'A' in img.getbands() or 'transparency' in img.info else 'RGB')
+        img.thumbnail((LARGURA_MAXIMA_LOGO_PX, ALTURA_MAXIMA_LOGO_PX))
+        saida = io.BytesIO()
+        img.save(saida, format='PNG', optimize=True)
+        png = saida.getvalue()
+        Image.open(io.BytesIO(png)).verify()
+        anotar(bytes=len(response.content))
+        return png
+    except ErroLogo:
+        raise
+    except Exception as e:
+        raise ErroLogo("Falha ao baixar ou processar o logo.") from e
+
+
+@cronometrado("obter_logo", cache="hit")
+def obter_logo(url):
+    """Devolve o logo em PNG a partir da cache, baixando-o apenas na primeira vez."""
+    url = (url or '').strip()
+    if not url:
+        anotar(cache=None)
+        return None
+    png = _cache_logos.obter(url)
+    if png is not None:
+        return png
+    falha = _falhas_logo.obter(url)
+    if falha is not None:
+        raise ErroLogo(falha)
+    anotar(cache="miss")
+    try:
+        png = baixar_logo(url)
+    except ErroLogo as e:
+        _falhas_logo.guardar(url, str(e))
+        raise
+    _cache_logos.guardar(url, png)
+    return png
+
+
+def tabela_de_medias(medias):
+    """Converte uma Series {dimensão: média} na tabela ordenada usada no gráfico e no PDF."""
+    df_medias = medias.dropna().sort_values(ascending=True).reset_index()
+    df_medias.columns = ['Dimensão', 'Pontuação Média']
+    return df_medias
+
+
+@cronometrado("criar_grafico_medias")
+def criar_grafico_medias(df_medias):
+    """Gráfico de barras horizontais com a pontuação média de cada dimensão."""
+    fig = px.bar(df_medias, x='Pontuação Média', y='Dimensão', orientation='h', title='Pontuação Média por Dimensão', text=df_medias['Pontuação Média'].apply(lambda x: f'{x:.2f}'), color='Pontuação Média', color_continuous_scale='RdYlGn_r', height=800)
+    fig.update_layout(yaxis={'categoryorder':'total ascending'})
+    return fig
+
+
+class PDF(FPDF):
+    def __init__(self, logo_png=None):
+        super().__init__()
+        self.logo_png = logo_png
+
+    def header_fallback_texto(self):
+        self.set_font('Arial', 'B', 16)
+        self.set_text_color(0, 51, 102)
+        self.cell(0, 10, 'IPSI', 0, 0, 'L')
+        self.ln(5)
+        self.set_font('Arial', 'I', 10)
+        self.set_text_color(102, 102, 102)
+        self.cell(0, 10, 'Consultoria em Saúde Organizacional', 0, 1, 'L')
+
+    def header(self):
+        logo_adicionado = False
+        if self.logo_png:
+            try:
+                self.image(io.BytesIO(self.logo_png), x=10, y=8, h=12)
+                logo_adicionado = True
+            except Exception:
+                pass
+        if not logo_adicionado:
+            self.header_fallback_texto()
+        self.set_line_width(0.5)
+        self.set_draw_color(0, 51, 102)
+        self.line(10, 25, 200, 25)
+        self.ln(10)
+        self.set_font('Arial', 'B', 12)
+        self.set_text_color(0, 0, 0)
+        self.cell(0, 10, 'Relatório de Diagnóstico Psicossocial - COPSOQ II (Versão Curta - Brasil)', 0, 1, 'C')
+        self.ln(5)
+
+    def footer(self):
+        self.set_y(-15)
+        self.set_font('Arial', 'I', 8)
+        self.cell(0, 10, f'Página {self.page_no()}', 0, 0, 'C')
+
+
+@cronometrado("gerar_relatorio_pdf")
+def gerar_relatorio_pdf(df_medias, total_respostas, logo_png=None):
+    """Monta o relatório PDF a partir da tabela de médias. 'logo_png' são os bytes de um PNG já validado."""
+    pdf = PDF(logo_png=logo_png)
+    pdf.add_page()
+    pdf.set_font('Arial', 'B', 14)
+    pdf.cell(0, 10, 'Sumário dos Resultados', 0, 1, 'L')
+    pdf.set_font('Arial', '', 12)
+    pdf.multi_cell(0, 10, f"Este relatório apresenta a média consolidada dos resultados do questionário, com base num total de {total_respostas} respostas recolhidas.")
+    pdf.ln(10)
+    pdf.set_font('Arial', 'B', 12)
+    pdf.cell(0, 10, 'Tabela de Pontuações Médias por Dimensão', 0, 1, 'L')
+    pdf.set_font('Arial', 'B', 10)
+    col_width_dimensao = 130
+    col_width_pontuacao = 40
+    pdf.cell(col_width_dimensao, 10, 'Dimensão', 1, 0, 'C')
+    pdf.cell(col_width_pontuacao, 10, 'Pontuação Média', 1, 1, 'C')
+    pdf.set_font('Arial', '', 10)
+    for index, row in df_medias.iterrows():
+        pdf.cell(col_width_dimensao, 8, row['Dimensão'].encode('latin-1', 'replace').decode('latin-1'), 1, 0)
+        pdf.cell(col_width_pontuacao, 8, f"{row['Pontuação Média']:.2f}", 1, 1, 'C')
+    pdf.ln(10)
+    buffer = io.BytesIO()
+    pdf.output(buffer)
+    return buffer.getvalue()
+
+
+def chave_relatorio(df_medias, total_respostas, logo_png=None):
+    """Hash do conteúdo que determina o PDF: tabela de médias, total de respostas e logo."""
+    resumo = hashlib.sha256()
+    resumo.update(df_medias.to_csv(index=False).encode('utf-8'))
+    resumo.update(str(total_respostas).encode('utf-8'))
+    resumo.update(logo_png or b'')
+    return resumo.hexdigest()
+
+
+@cronometrado("obter_relatorio_pdf", cache="hit")
+def obter_relatorio_pdf(df_medias, total_respostas, logo_png=None):
+    """Devolve o PDF da cache se o conteúdo não mudou; caso contrário gera-o e guarda-o."""
+    chave = chave_relatorio(df_medias, total_respostas, logo_png)
+    pdf_bytes = _cache_relatorios.obter(chave)
+    if pdf_bytes is None:
+        anotar(cache="miss")
+        pdf_bytes = gerar_relatorio_pdf(df_medias, total_respostas, logo_png)
+        _cache_relatorios.guardar(chave, pdf_bytes)
+    return pdf_bytes
+
+
+def limpar_caches():
+    """Esquece logos, falhas de download e relatórios já gerados."""
+    for cache in (_cache_logos, _falhas_logo, _cache_relatorios):
+        cache.limpar()
@@ -0,0 +1,33 @@
+"""
+Pontuações de referência do questionário e equivalência entre o cálculo em lote e o
+individual. Correr com 'python -m pytest -q'.
+"""
+import numpy as np
+import pandas as pd
+
+import calculadora_copsoq_br as motor
+from dados_sinteticos import gerar_respostas_sinteticas, respostas_como_registros
+
+
+def test_calcular_dimensoes_valores_conhecidos():
+    pontuacoes = motor.calcular_dimensoes({"Q1": "Sempre", "Q2": "Raramente", "Q4": "Boa", "Q5": None})
+    assert pontuacoes["Ritmo de Trabalho"] == 62.5
+    assert pontuacoes["Exigências Cognitivas"] == 75.0
+    assert pontuacoes["Exigências Emocionais"] is None
+
+
+def test_lote_igual_ao_calculo_individual():
+    respostas = gerar_respostas_sinteticas(500, semente=7)
+    registros = respostas_como_registros(respostas)
+    registros[0]["Q1"] = "resposta desconhecida"
+    individuais = [motor.calcular_dimensoes(registro) for registro in registros]
+    lote = motor.calcular_dimensoes_lote(pd.DataFrame(registros))
+    assert (lote.dtypes == np.float64).all()
+    assert motor.pontuacoes_para_registros(lote) == individuais
+
+
+def test_lote_sem_respostas_validas_devolve_floats():
+    lote = motor.calcular_dimensoes_lote(pd.DataFrame([{"Q1": None}, {"Q1": None}]))
+    assert (lote.dtypes == np.float64).all()
+    assert lote.isna().all().all()
+    assert motor.pontuacoes_para_registros(lote)[0]["Ritmo de Trabalho"] is None
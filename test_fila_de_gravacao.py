@@ -0,0 +1,135 @@
+"""
+Caminhos de durabilidade do gravador em lote: fila cheia, erros no ciclo e thread parada.
+Correr com 'python -m pytest -q'.
+"""
+import os
+import time
+from unittest import mock
+
+import pytest
+import requests
+
+import fila_de_gravacao
+from armazenamento import CABECALHO, ArmazenamentoSQLite
+
+
+def _esperar(condicao, limite=5.0):
+    fim = time.monotonic() + limite
+    while not condicao() and time.monotonic() < fim:
+        time.sleep(0.02)
+    return condicao()
+
+
+def _linhas_no_spool(caminho):
+    if not os.path.exists(caminho):
+        return 0
+    with open(caminho, encoding="utf-8") as ficheiro:
+        return sum(1 for linha in ficheiro if linha.strip())
+
+
+@pytest.fixture
+def armazenamento(tmp_path):
+    armazenamento = ArmazenamentoSQLite(str(tmp_path / "respostas.db"))
+    yield armazenamento
+    armazenamento.fechar()
+
+
+def test_fila_cheia_nao_perde_respostas(armazenamento, tmp_path):
+    spool = str(tmp_path / "spool.jsonl")
+    gravador = fila_de_gravacao.GravadorEmLote(armazenamento, spool, intervalo=0.05, tamanho_fila=2)
+    try:
+        for i in range(8):
+            assert gravador.enviar([str(i)] * len(CABECALHO))
+        assert _esperar(lambda: len(armazenamento.carregar()) == 8 and _linhas_no_spool(spool) == 0)
+    finally:
+        gravador.parar()
+
+
+def test_erro_no_ciclo_nao_termina_a_thread_nem_duplica(armazenamento, tmp_path):
+    spool = str(tmp_path / "spool.jsonl")
+    gravador = fila_de_gravacao.GravadorEmLote(armazenamento, spool, intervalo=0.05)
+    substituir = os.replace
+    falhas = []
+
+    def falhar_uma_vez(*args):
+        if not falhas:
+            falhas.append(args)
+            raise OSError("falha simulada ao reescrever o spool")
+        return substituir(*args)
+
+    try:
+        with mock.patch.object(fila_de_gravacao.os, "replace", falhar_uma_vez):
+            gravador.enviar(["x"] * len(CABECALHO))
+            assert _esperar(lambda: falhas)
+            gravador.enviar(["y"] * len(CABECALHO))
+            assert _esperar(lambda: _linhas_no_spool(spool) == 0)
+        assert gravador.ativo
+        assert len(armazenamento.carregar()) == 2
+    finally:
+        gravador.parar()
+
+
+class _ArmazenamentoEmFalha:
+    """Falha com 'erro' nas primeiras 'falhas' chamadas a salvar_lote e depois grava no 'destino'."""
+
+    def __init__(self, destino, erro, falhas):
+        self.destino = destino
+        self.erro = erro
+        self.falhas = falhas
+        self.chamadas = 0
+
+    def salvar_lote(self, linhas):
+        self.chamadas += 1
+        if self.chamadas <= self.falhas:
+            raise self.erro
+        return self.destino.salvar_lote(linhas)
+
+
+@pytest.mark.parametrize("erro", [
+    requests.exceptions.ConnectionError("rede em baixo"),
+    TypeError("A resposta da API do Google não foi a esperada."),
+])
+def test_falhas_seguidas_esperam_antes_de_repetir(armazenamento, tmp_path, erro):
+    em_falha = _ArmazenamentoEmFalha(armazenamento, erro, falhas=10**9)
+    gravador = fila_de_gravacao.GravadorEmLote(
+        em_falha, str(tmp_path / "spool.jsonl"), intervalo=0.01, tamanho_lote=5,
+        espera_inicial=0.05, espera_maxima=0.2,
+    )
+    try:
+        for i in range(6):
+            gravador.enviar([str(i)] * len(CABECALHO))
+        time.sleep(1.0)
+        # Com espera exponencial (0.05, 0.1, 0.2, 0.2, ...) cabem poucas tentativas num segundo.
+        assert 2 <= em_falha.chamadas <= 10
+        assert gravador.ativo
+        em_falha.falhas = em_falha.chamadas
+        assert _esperar(lambda: len(armazenamento.carregar()) == 6)
+    finally:
+        gravador.parar()
+
+
+def test_obter_gravador_substitui_thread_parada(armazenamento, tmp_path):
+    spool = str(tmp_path / "spool.jsonl")
+    primeiro = fila_de_gravacao.obter_gravador(spool, lambda: armazenamento, intervalo=0.05)
+    primeiro.parar()
+    segundo = fila_de_gravacao.obter_gravador(spool, lambda: armazenamento, intervalo=0.05)
+    try:
+        assert segundo is not primeiro and segundo.ativo
+    finally:
+        segundo.parar()
+
+
+def test_obter_gravador_segue_o_armazenamento_atual(armazenamento, tmp_path):
+    spool = str(tmp_path / "spool.jsonl")
+    novo = ArmazenamentoSQLite(str(tmp_path / "novo.db"))
+    gravador = fila_de_gravacao.obter_gravador(spool, lambda: armazenamento, intervalo=0.05)
+    try:
+        gravador.enviar(["antigo"] * len(CABECALHO))
+        assert _esperar(lambda: len(armazenamento.carregar()) == 1)
+        assert fila_de_gravacao.obter_gravador(spool, lambda: novo) is gravador
+        gravador.enviar(["novo"] * len(CABECALHO))
+        assert _esperar(lambda: len(novo.carregar()) == 1)
+        assert len(armazenamento.carregar()) == 1
+    finally:
+        gravador.parar()
+        novo.fechar()
@@ -0,0 +1,68 @@
+"""
+Valores de referência dos testes entre ondas (t de Welch e qui-quadrado das faixas).
+Correr com 'python -m pytest -q'.
+"""
+import numpy as np
+import pytest
+
+import calculadora_copsoq_br as motor
+import ondas
+from agregados_incrementais import IndiceSegmentos
+
+
+def _somas(amostra):
+    amostra = np.asarray(amostra, dtype=np.float64)
+    return len(amostra), amostra.sum(), (amostra * amostra).sum()
+
+
+@pytest.mark.parametrize("t, graus, esperado", [(2.0, 10, 0.073388), (2.228139, 10, 0.05), (12.0, 2, 0.006873)])
+def test_valor_p_da_distribuicao_t(t, graus, esperado):
+    p = ondas._beta_incompleta_regularizada(graus / 2.0, 0.5, graus / (graus + t * t))
+    assert p == pytest.approx(esperado, abs=1e-6)
+
+
+def test_welch_com_t_e_graus_conhecidos():
+    # Duas amostras de 6 com a mesma variância: graus = 10; a diferença escolhida dá t = 2.
+    anterior = np.arange(6.0)
+    atual = anterior + 2 * np.sqrt(anterior.var(ddof=1) / 3)
+    diferenca, t, graus, p = ondas.teste_welch(*_somas(anterior), *_somas(atual))
+    assert t == pytest.approx(2.0)
+    assert graus == pytest.approx(10.0)
+    assert p == pytest.approx(0.073388, abs=1e-6)
+    assert diferenca == pytest.approx(2.160247, abs=1e-6)
+
+
+def test_welch_sem_variancia():
+    _, t, _, p = ondas.teste_welch(*_somas([50, 50]), *_somas([50, 50]))
+    assert (t, p) == (0.0, 1.0)
+    _, t, _, p = ondas.teste_welch(*_somas([50, 50]), *_somas([75, 75]))
+    assert (t, p) == (np.inf, 0.0)
+
+
+def test_qui_quadrado_das_faixas():
+    estatistica, p = ondas.teste_faixas([10, 20, 30], [30, 20, 10])
+    assert estatistica == pytest.approx(20.0)
+    assert p == pytest.approx(4.53999e-5, rel=1e-4)
+    # Uma faixa vazia nas duas ondas não conta para os graus de liberdade (1 em vez de 2).
+    _, p = ondas.teste_faixas([10, 0, 30], [30, 0, 10])
+    assert p == pytest.approx(7.744e-6, rel=1e-3)
+
+
+def _indice(respostas_por_grupo):
+    """IndiceSegmentos com 'n' respostas iguais (50 em todas as dimensões) em cada (empresa, onda)."""
+    indice = IndiceSegmentos()
+    for (empresa, onda), n in respostas_por_grupo.items():
+        for _ in range(n):
+            indice.adicionar((empresa, "", "", onda), {dimensao: 50.0 for dimensao in motor.definicao_dimensoes})
+    return indice
+
+
+@pytest.mark.parametrize("empresa", ["ACME", ""])
+def test_onda_fechada_e_registada_com_outra_onda_pequena(empresa):
+    indice = _indice({("ACME", "2025-1"): 100, ("ACME", "2025-2"): 3})
+    # No painel, a onda grande fica escondida: a diferença para o total exporia a pequena.
+    assert indice.consultar({"Empresa": "ACME", "Onda": "2025-1"}) == (100, {})
+    instantaneo = ondas.criar_instantaneo(indice, empresa, "2025-1")
+    assert instantaneo.total_respostas == 100
+    with pytest.raises(ValueError, match="tamanho mínimo"):
+        ondas.criar_instantaneo(indice, empresa, "2025-2")